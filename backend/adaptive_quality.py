@@ -0,0 +1,98 @@
+import logging
+import time
+
+logger = logging.getLogger("adaptive-quality")
+
+# Níveis de qualidade, do melhor para o pior: qualidade JPEG, escala da resolução e FPS alvo
+QUALITY_TIERS = [
+    {"name": "full", "quality": 70, "scale": 1.0, "fps": 30},
+    {"name": "reduced", "quality": 60, "scale": 0.75, "fps": 20},
+    {"name": "low", "quality": 50, "scale": 0.5, "fps": 12},
+    {"name": "minimal", "quality": 40, "scale": 0.25, "fps": 6},
+]
+
+TIERS_BY_NAME = {tier["name"]: tier for tier in QUALITY_TIERS}
+
+# Fração do intervalo do FPS alvo tolerada como adiantamento: frames chegam da captura
+# com jitter e, sem folga, um frame pouco adiantado seria descartado no FPS máximo
+SEND_INTERVAL_TOLERANCE = 0.25
+
+
+class AdaptiveQuality:
+    """Ajusta qualidade, resolução e FPS de um cliente conforme a latência de envio e o backlog do socket."""
+
+    def __init__(self, min_tier=0, max_tier=len(QUALITY_TIERS) - 1,
+                 latency_budget=0.05, backlog_limit=256 * 1024,
+                 upgrade_after=30, cooldown=1.0):
+        """Inicializa o controle adaptativo.
+
+        min_tier e max_tier limitam os índices de QUALITY_TIERS que o cliente pode usar
+        (0 é a melhor qualidade).
+        """
+        self.min_tier = max(0, min_tier)
+        self.max_tier = min(len(QUALITY_TIERS) - 1, max_tier)
+        self.latency_budget = latency_budget
+        self.backlog_limit = backlog_limit
+        self.upgrade_after = upgrade_after
+        self.cooldown = cooldown
+
+        self.tier_index = self.min_tier
+        self.send_latency = 0.0
+        self.backlog = 0
+        self.good_samples = 0
+        self.last_change = 0.0
+        self.last_sent = 0.0
+        self.changes = 0
+
+    @property
+    def tier(self):
+        """Retorna o nível atual."""
+        return QUALITY_TIERS[self.tier_index]
+
+    def should_send(self, now=None):
+        """Indica se já é hora de enviar outro frame respeitando o FPS alvo do nível."""
+        now = now if now is not None else time.monotonic()
+        if now - self.last_sent < (1.0 - SEND_INTERVAL_TOLERANCE) / self.tier["fps"]:
+            return False
+        self.last_sent = now
+        return True
+
+    def record_send(self, latency, backlog):
+        """Registra a latência de um envio e o backlog do socket e ajusta o nível se necessário."""
+        # Média móvel exponencial para suavizar oscilações pontuais
+        self.send_latency = 0.8 * self.send_latency + 0.2 * latency
+        self.backlog = backlog
+        now = time.monotonic()
+
+        congested = self.send_latency > self.latency_budget or backlog > self.backlog_limit
+        if congested:
+            self.good_samples = 0
+            if self.tier_index < self.max_tier and now - self.last_change >= self.cooldown:
+                self._set_tier(self.tier_index + 1, now)
+        else:
+            self.good_samples += 1
+            if (self.tier_index > self.min_tier and self.good_samples >= self.upgrade_after
+                    and now - self.last_change >= self.cooldown):
+                self._set_tier(self.tier_index - 1, now)
+
+    def _set_tier(self, index, now):
+        """Troca de nível (um passo por vez, para degradar de forma suave)."""
+        previous = self.tier["name"]
+        self.tier_index = index
+        self.good_samples = 0
+        self.last_change = now
+        self.changes += 1
+        logger.info(f"Nível de qualidade alterado: {previous} -> {self.tier['name']} "
+                    f"(latência {self.send_latency * 1000:.1f} ms, backlog {self.backlog} bytes)")
+
+    def get_stats(self):
+        """Retorna o nível atual e as medições do cliente."""
+        return {
+            "tier": self.tier["name"],
+            "quality": self.tier["quality"],
+            "scale": self.tier["scale"],
+            "fps": self.tier["fps"],
+            "send_latency_ms": round(self.send_latency * 1000, 2),
+            "backlog_bytes": self.backlog,
+            "changes": self.changes,
+        }
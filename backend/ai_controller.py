@@ -4,9 +4,19 @@ import cv2
 import time
 import random
 from collections import deque
+from image_pyramid import ImagePyramid
+from metrics import REGISTRY
+from overlay import SpriteCache
 
 logger = logging.getLogger("ai-controller")
 
+# Métricas de inferência
+INFERENCE_SECONDS = REGISTRY.histogram("drone_ai_inference_seconds", "Tempo de inferência da IA por frame")
+DETECTION_ERRORS = REGISTRY.counter("drone_ai_detection_errors_total", "Falhas do detector de objetos")
+
+# Escala padrão da detecção em relação ao frame (1.0, 0.5 ou 0.25 usam níveis prontos da pirâmide)
+DETECTION_SCALE = 0.5
+
 class AIController:
     """Controlador de IA para o drone, fornecendo recursos de inteligência artificial."""
     
@@ -19,11 +29,20 @@ class AIController:
         # Configurações de IA
         self.confidence_threshold = 0.5
         self.max_objects = 10
+        # Resolução da detecção: o detector roda no frame reduzido e as caixas voltam à escala do frame
+        self.detection_scale = DETECTION_SCALE
         
         # Estado atual
         self.detected_objects = []
         self.last_processed_time = 0
         self.processing_fps = 0
+        self.detection_errors = 0
+        
+        # Sprites dos textos estáticos do overlay (modo da IA), usados só pelo estágio de IA
+        self.sprites = SpriteCache()
+        
+        # Detector de objetos compartilhado entre drones (BatchingDetector); sem ele, detecção simulada
+        self.detector = None
         
         # Simulação de IA
         self.simulated_objects = [
@@ -63,45 +82,101 @@ class AIController:
         logger.info("Controlador de IA inicializado com sucesso")
         return True
     
-    def process_frame(self, frame):
-        """Processa um frame com IA e retorna o frame anotado."""
+    def process_frame(self, frame, pyramid=None):
+        """Processa um frame com IA e retorna o frame anotado (no lugar, sem cópia).
+        
+        pyramid é a pirâmide do frame (ImagePyramid), quando quem chama já a tem.
+        """
+        self.detect(frame, pyramid)
+        
+        # Frames publicados são somente leitura; os do pipeline de vídeo são anotados no lugar
+        if not frame.flags.writeable:
+            frame = frame.copy()
+        return self.annotate(frame)
+    
+    def detect(self, frame, pyramid=None):
+        """Detecta objetos no frame e atualiza detected_objects e o FPS da IA.
+        
+        As caixas retornadas estão sempre em coordenadas do frame completo.
+        """
         start_time = time.time()
         
-        # Simular detecção de objetos
-        self.detected_objects = self._simulate_object_detection(frame)
+        # Detectar objetos (detector, se conectado, ou simulação); em caso de falha,
+        # mantém as últimas detecções e o frame segue pelo pipeline
+        try:
+            self.detected_objects = self._detect_objects(frame, pyramid)
+        except Exception as e:
+            self.detection_errors += 1
+            DETECTION_ERRORS.inc()
+            if self.detection_errors == 1 or self.detection_errors % 100 == 0:
+                logger.error(f"Erro na detecção de objetos ({self.detection_errors} falhas): {str(e)}")
         
         # Calcular FPS
         processing_time = time.time() - start_time
+        INFERENCE_SECONDS.observe(processing_time, mode=self.current_mode)
         self.processing_fps = 1.0 / processing_time if processing_time > 0 else 0
         self.last_processed_time = time.time()
-        
-        # Anotar o frame com os resultados
-        annotated_frame = frame.copy()
-        
+        return self.detected_objects
+    
+    def annotate(self, frame):
+        """Desenha as detecções e as informações de IA no frame, no lugar."""
         # Desenhar caixas delimitadoras
         for obj in self.detected_objects:
             label = f"{obj['class']} {obj['confidence']:.2f}"
             bbox = obj["bbox"]
             
             # Desenhar retângulo
-            cv2.rectangle(annotated_frame, 
+            cv2.rectangle(frame, 
                          (int(bbox[0]), int(bbox[1])), 
                          (int(bbox[2]), int(bbox[3])), 
                          (0, 255, 0), 2)
             
             # Desenhar texto
-            cv2.putText(annotated_frame, label, 
+            cv2.putText(frame, label, 
                        (int(bbox[0]), int(bbox[1]) - 10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         
         # Adicionar informações de IA
-        cv2.putText(annotated_frame, f"IA: {self.current_mode}", 
-                   (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        self.sprites.draw_text(frame, f"IA: {self.current_mode}", (10, 80))
         
-        cv2.putText(annotated_frame, f"IA FPS: {self.processing_fps:.1f}", 
+        cv2.putText(frame, f"IA FPS: {self.processing_fps:.1f}", 
                    (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
-        return annotated_frame
+        return frame
+    
+    def set_detector(self, detector):
+        """Define o detector de objetos (BatchingDetector já carregado e aquecido)."""
+        self.detector = detector
+        logger.info(f"Detector {detector.backend.name if detector else 'simulado'} conectado")
+    
+    def _detect_objects(self, frame, pyramid=None):
+        """Detecta objetos com o detector compartilhado; sem ele, usa a simulação."""
+        if self.detector is not None:
+            if pyramid is None:
+                pyramid = ImagePyramid(frame)
+            return self._detect_with_backend(pyramid)
+        return self._filter_detections(self._simulate_object_detection(frame))
+    
+    def _detect_with_backend(self, pyramid):
+        """Detecta objetos com o detector compartilhado no nível reduzido da pirâmide."""
+        results = self.detector.detect(pyramid.scaled(self.detection_scale))
+        
+        # Caixas normalizadas convertidas para o frame completo
+        detected_objects = []
+        for class_name, confidence, (x1, y1, x2, y2) in results:
+            detected_objects.append({
+                "class": class_name,
+                "confidence": confidence,
+                "bbox": [int(x1 * pyramid.width), int(y1 * pyramid.height),
+                         int(x2 * pyramid.width), int(y2 * pyramid.height)]
+            })
+        return self._filter_detections(detected_objects)
+    
+    def _filter_detections(self, detected_objects):
+        """Aplica o limiar de confiança e o máximo de objetos (os mais confiáveis primeiro)."""
+        detected_objects = [obj for obj in detected_objects if obj["confidence"] >= self.confidence_threshold]
+        detected_objects.sort(key=lambda obj: obj["confidence"], reverse=True)
+        return detected_objects[:self.max_objects]
     
     def _simulate_object_detection(self, frame):
         """Simula a detecção de objetos quando não há modelo real disponível."""
@@ -179,12 +254,16 @@ class AIController:
             "detected_objects": len(self.detected_objects),
             "processing_fps": self.processing_fps,
             "last_processed": self.last_processed_time,
+            "detection_scale": self.detection_scale,
+            "detection_errors": self.detection_errors,
+            "overlay_sprites": self.sprites.get_stats(),
+            "detector": self.detector.get_stats() if self.detector else None,
         }
     
     def analyze_scene(self, frame):
         """Analisa a cena e retorna uma descrição textual."""
-        # Processar o frame para obter objetos
-        self.process_frame(frame)
+        # Detectar objetos (o frame não é anotado)
+        self.detect(frame)
         
         # Gerar descrição baseada nos objetos detectados
         if not self.detected_objects:
@@ -0,0 +1,61 @@
+import cv2
+
+# Nível da pirâmide comparado (2 = 1/4 da resolução)
+CHANGE_LEVEL = 2
+# Grade de blocos: a diferença média de cada bloco é comparada com o limiar
+CHANGE_GRID = (16, 12)
+
+
+class ChangeDetector:
+    """Detector barato de mudança de cena, por blocos, sobre um nível reduzido da pirâmide.
+
+    O frame reduzido em tons de cinza é comparado com o último frame de referência
+    (o último processado por completo, não o anterior, para que mudanças lentas se
+    acumulem). A cena mudou quando a diferença média de algum bloco passa do limiar
+    (0-255); um movimento pequeno e local não se dilui no frame inteiro. Depois de
+    refresh_frames frames estáticos seguidos, uma atualização é forçada.
+    """
+
+    def __init__(self, threshold=0.0, refresh_frames=30):
+        """Inicializa o detector (threshold <= 0, o padrão, desativa: todo frame conta como mudança)."""
+        self.threshold = threshold
+        self.refresh_frames = refresh_frames
+        self.reference = None
+        self.static_run = 0
+        self.checks = 0
+        self.static = 0
+        self.forced = 0
+        self.last_difference = None
+
+    def changed(self, pyramid):
+        """Indica se o frame da pirâmide deve ser processado (mudou ou atualização forçada)."""
+        if self.threshold <= 0:
+            return True
+        self.checks += 1
+        gray = cv2.cvtColor(pyramid.level(CHANGE_LEVEL), cv2.COLOR_BGR2GRAY)
+
+        if self.reference is not None and self.reference.shape == gray.shape:
+            blocks = cv2.resize(cv2.absdiff(gray, self.reference), CHANGE_GRID, interpolation=cv2.INTER_AREA)
+            self.last_difference = float(blocks.max())
+            if self.last_difference < self.threshold:
+                if self.static_run < self.refresh_frames:
+                    self.static_run += 1
+                    self.static += 1
+                    return False
+                self.forced += 1
+
+        self.reference = gray
+        self.static_run = 0
+        return True
+
+    def get_stats(self):
+        """Retorna a taxa de frames estáticos reaproveitados e as atualizações forçadas."""
+        return {
+            "threshold": self.threshold,
+            "refresh_frames": self.refresh_frames,
+            "checks": self.checks,
+            "static": self.static,
+            "forced_refreshes": self.forced,
+            "hit_rate": round(self.static / self.checks, 3) if self.checks else None,
+            "last_difference": self.last_difference,
+        }
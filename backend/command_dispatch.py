@@ -0,0 +1,214 @@
+import asyncio
+import itertools
+import logging
+import time
+
+logger = logging.getLogger("command-dispatch")
+
+# Prioridades dos comandos (menor valor é atendido primeiro)
+PRIORITY_SAFETY = 0
+PRIORITY_CONTROL = 1
+PRIORITY_QUERY = 2
+PRIORITY_BACKGROUND = 3
+
+
+class CommandPreemptedError(RuntimeError):
+    """Erro entregue a comandos descartados da fila por um comando de segurança."""
+
+
+class CommandSpec:
+    """Descrição de um comando registrado."""
+
+    def __init__(self, name, handler, priority, background=False, preemptible=False, flight_control=False):
+        """Inicializa a descrição do comando."""
+        self.name = name
+        self.handler = handler
+        self.priority = priority
+        self.background = background
+        self.preemptible = preemptible
+        self.flight_control = flight_control
+
+
+class CommandRegistry:
+    """Registro de handlers assíncronos de comandos, indexados pelo nome."""
+
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self.commands = {}
+
+    def register(self, name, priority=PRIORITY_CONTROL, background=False, preemptible=False, flight_control=False):
+        """Decorador que registra um handler async (drone, params, client_id) -> resultado.
+
+        drone é o contexto do agendador que despacha o comando (o pipeline do drone).
+
+        background: o comando é despachado em uma tarefa própria e não segura a fila.
+        preemptible: o comando pode ser descartado da fila por um comando de segurança.
+        flight_control: o comando move o drone (takeoff, move...) e, ainda na fila, é sempre
+        descartado por um comando de segurança: nunca roda depois de um land ou stop posterior.
+        """
+        def decorator(handler):
+            self.commands[name] = CommandSpec(name, handler, priority, background, preemptible, flight_control)
+            return handler
+        return decorator
+
+    def get(self, name):
+        """Retorna a descrição de um comando, ou None se não estiver registrado."""
+        return self.commands.get(name)
+
+
+class CommandTiming:
+    """Estatísticas de tempo de um comando: espera na fila e execução."""
+
+    def __init__(self):
+        """Inicializa os acumuladores."""
+        self.count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def record(self, wait, run):
+        """Registra os tempos de um comando concluído."""
+        self.count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += run
+        self.run_max = max(self.run_max, run)
+
+    def get_stats(self):
+        """Retorna os tempos em milissegundos."""
+        return {
+            "count": self.count,
+            "wait_avg_ms": round(self.wait_total / self.count * 1000, 3) if self.count else 0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "run_avg_ms": round(self.run_total / self.count * 1000, 3) if self.count else 0,
+            "run_max_ms": round(self.run_max * 1000, 3),
+        }
+
+
+class QueuedCommand:
+    """Comando aguardando despacho, com seus instantes de recebimento, despacho e conclusão."""
+
+    def __init__(self, spec, params, client_id, reply):
+        """Inicializa o comando enfileirado."""
+        self.spec = spec
+        self.params = params
+        self.client_id = client_id
+        self.reply = reply
+        self.received_at = time.perf_counter()
+        self.dispatched_at = None
+        self.completed_at = None
+        self.cancelled = False
+
+
+class CommandScheduler:
+    """Fila de comandos com prioridade de um drone.
+
+    Comandos de segurança (land, stop) passam à frente dos comandos enfileirados e
+    descartam os de controle de voo (takeoff, move...) e os preemptíveis pendentes. Comandos em segundo plano são despachados em tarefas
+    próprias, de modo que nunca seguram a fila.
+    """
+
+    def __init__(self, drone_id, registry, context=None):
+        """Inicializa o agendador do drone; context é repassado como primeiro argumento dos handlers."""
+        self.drone_id = drone_id
+        self.registry = registry
+        self.context = context
+        self.queue = asyncio.PriorityQueue()
+        # Comandos na fila ainda não despachados (a fila de prioridade não expõe seus itens)
+        self.pending = set()
+        self.counter = itertools.count()
+        self.background_tasks = {}
+        self.reply_tasks = set()
+        self.timings = {}
+        self.preempted = 0
+        self.worker = None
+
+    def start(self):
+        """Inicia a tarefa que consome a fila."""
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+
+    def submit(self, spec, params, client_id, reply):
+        """Enfileira um comando. reply(result, error) é chamado (async) quando ele termina."""
+        entry = QueuedCommand(spec, params, client_id, reply)
+        if spec.priority == PRIORITY_SAFETY:
+            self._preempt()
+        self.pending.add(entry)
+        self.queue.put_nowait((spec.priority, next(self.counter), entry))
+        return entry
+
+    def _preempt(self):
+        """Descarta os comandos de controle de voo e os preemptíveis ainda na fila."""
+        for entry in list(self.pending):
+            if (entry.spec.flight_control or entry.spec.preemptible) and not entry.cancelled:
+                entry.cancelled = True
+                self.pending.discard(entry)
+                self.preempted += 1
+                task = asyncio.create_task(entry.reply(None, CommandPreemptedError(
+                    f"Comando {entry.spec.name} descartado por comando de segurança")))
+                self.reply_tasks.add(task)
+                task.add_done_callback(self.reply_tasks.discard)
+
+    def cancel_owner(self, client_id):
+        """Cancela os comandos enfileirados e em segundo plano de um cliente desconectado."""
+        for entry in list(self.pending):
+            if entry.client_id == client_id:
+                entry.cancelled = True
+                self.pending.discard(entry)
+        for task in self.background_tasks.pop(client_id, set()):
+            task.cancel()
+
+    def queue_depth(self):
+        """Retorna o número de comandos aguardando despacho."""
+        return len(self.pending)
+
+    async def _run(self):
+        """Consome a fila em ordem de prioridade."""
+        while True:
+            _, _, entry = await self.queue.get()
+            self.pending.discard(entry)
+            if entry.cancelled:
+                continue
+
+            entry.dispatched_at = time.perf_counter()
+            if entry.spec.background:
+                task = asyncio.create_task(self._execute(entry))
+                tasks = self.background_tasks.setdefault(entry.client_id, set())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            else:
+                await self._execute(entry)
+
+    async def _execute(self, entry):
+        """Executa o handler do comando, registra os tempos e responde ao cliente."""
+        result = None
+        error = None
+        try:
+            result = await entry.spec.handler(self.context, entry.params, entry.client_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+
+        entry.completed_at = time.perf_counter()
+        timing = self.timings.setdefault(entry.spec.name, CommandTiming())
+        timing.record(entry.dispatched_at - entry.received_at, entry.completed_at - entry.dispatched_at)
+        logger.debug("Comando %s: espera %.2f ms, execução %.2f ms", entry.spec.name,
+                     (entry.dispatched_at - entry.received_at) * 1000,
+                     (entry.completed_at - entry.dispatched_at) * 1000)
+
+        try:
+            await entry.reply(result, error)
+        except Exception as e:
+            logger.error(f"Erro ao responder comando {entry.spec.name}: {str(e)}")
+
+    def get_stats(self):
+        """Retorna profundidade da fila e tempos por comando."""
+        return {
+            "drone_id": self.drone_id,
+            "queue_depth": self.queue_depth(),
+            "background": sum(len(tasks) for tasks in self.background_tasks.values()),
+            "preempted": self.preempted,
+            "timings": {name: timing.get_stats() for name, timing in self.timings.items()},
+        }
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("control-loop")
+
+
+class MoveControlLoop:
+    """Agrupa setpoints de movimento e os envia ao drone em uma taxa fixa.
+
+    Cada comando move substitui o setpoint pendente (o último valor vence); a cada
+    tick o setpoint pendente, se houver, é enviado a DroneController.move.
+    """
+
+    def __init__(self, drone_controller, rate_hz=20.0):
+        """Inicializa o loop de controle do drone."""
+        self.drone_controller = drone_controller
+        self.rate_hz = rate_hz
+        self.pending = None
+        self.received = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.cleared = 0
+        self.task = None
+        # Envia os setpoints em uma thread (controlador remoto, cuja chamada bloqueia)
+        self.offload = False
+
+    def start(self):
+        """Inicia a tarefa que descarrega os setpoints na taxa configurada."""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def submit(self, left_right, forward_backward, up_down, yaw):
+        """Registra um novo setpoint, substituindo o anterior ainda não enviado."""
+        self.received += 1
+        if self.pending is not None:
+            self.coalesced += 1
+        self.pending = (left_right, forward_backward, up_down, yaw)
+
+    def clear(self):
+        """Descarta o setpoint pendente (usado por comandos de segurança)."""
+        if self.pending is not None:
+            self.pending = None
+            self.cleared += 1
+
+    def _take(self):
+        """Retira o setpoint pendente, se houver."""
+        setpoint, self.pending = self.pending, None
+        if setpoint is not None:
+            self.sent += 1
+        return setpoint
+
+    def flush(self):
+        """Envia o setpoint pendente ao drone, se houver."""
+        setpoint = self._take()
+        if setpoint is None:
+            return None
+        return self.drone_controller.move(*setpoint)
+
+    async def _run(self):
+        """Loop com pacing por deadline na taxa configurada."""
+        interval = 1.0 / self.rate_hz
+        next_deadline = time.monotonic()
+        while True:
+            try:
+                if self.offload:
+                    setpoint = self._take()
+                    if setpoint is not None:
+                        await asyncio.to_thread(self.drone_controller.move, *setpoint)
+                else:
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Erro ao enviar setpoint de movimento: {str(e)}")
+
+            next_deadline += interval
+            delay = next_deadline - time.monotonic()
+            if delay < 0:
+                next_deadline = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def get_stats(self):
+        """Retorna quantos setpoints foram recebidos, agrupados e enviados."""
+        return {
+            "rate_hz": self.rate_hz,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "cleared": self.cleared,
+            "pending": self.pending is not None,
+        }
@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from metrics import REGISTRY
+
+logger = logging.getLogger("detector-backends")
+
+DETECTOR_BATCH_SIZE = REGISTRY.histogram("drone_detector_batch_size", "Frames por lote de inferência do detector",
+                                         buckets=(1, 2, 3, 4, 6, 8, 12, 16))
+DETECTOR_BATCH_SECONDS = REGISTRY.histogram("drone_detector_batch_seconds", "Tempo de inferência de um lote do detector")
+
+# Tempo máximo que um frame espera pelo resultado do lote
+DETECT_TIMEOUT = 5.0
+
+
+class DetectorBackend:
+    """Interface dos backends de detecção de objetos.
+
+    detect_batch recebe uma lista de imagens BGR e retorna, para cada uma, uma lista
+    de (classe, confiança, (x1, y1, x2, y2)) com a caixa normalizada (0 a 1), para
+    que quem chama converta para o frame completo independente da escala da imagem.
+    """
+
+    name = "base"
+
+    def load(self):
+        """Carrega o modelo (bloqueante)."""
+        raise NotImplementedError
+
+    def warmup(self, runs=2, batch_size=1):
+        """Executa inferências vazias (lotes de batch_size) para alocar buffers e escolher kernels antes do primeiro frame."""
+        raise NotImplementedError
+
+    def detect_batch(self, images):
+        """Detecta objetos em um lote de imagens."""
+        raise NotImplementedError
+
+
+class OpenCVDNNDetector(DetectorBackend):
+    """Detector SSD na CPU com o módulo DNN do OpenCV, a partir de um modelo local.
+
+    O modelo (ONNX, TensorFlow ou TFLite, via cv2.dnn.readNet) deve produzir a saída
+    DetectionOutput do SSD: linhas [lote, classe, confiança, x1, y1, x2, y2] com a caixa
+    normalizada. labels_path é um arquivo com um nome de classe por linha, na ordem
+    dos ids do modelo; sem ele, a classe é o próprio id.
+    """
+
+    name = "opencv_dnn"
+
+    def __init__(self, model_path, config_path="", labels_path="", input_size=(300, 300),
+                 scale=1 / 127.5, mean=(127.5, 127.5, 127.5), swap_rb=True):
+        """Guarda a configuração do modelo (o carregamento é feito em load())."""
+        self.model_path = model_path
+        self.config_path = config_path
+        self.labels_path = labels_path
+        self.input_size = input_size
+        self.scale = scale
+        self.mean = mean
+        self.swap_rb = swap_rb
+        self.net = None
+        self.labels = []
+        # Modelos exportados com lote fixo de 1 não aceitam lotes maiores: uma inferência por imagem
+        self.batched = True
+
+    def load(self):
+        """Carrega a rede e os rótulos, usando o backend e o alvo de CPU do OpenCV."""
+        start_time = time.time()
+        self.net = cv2.dnn.readNet(self.model_path, self.config_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        if self.labels_path:
+            with open(self.labels_path, encoding="utf-8") as file:
+                self.labels = [line.strip() for line in file]
+        logger.info(f"Modelo {self.model_path} carregado em {time.time() - start_time:.2f}s")
+
+    def warmup(self, runs=2, batch_size=1):
+        """Executa inferências em lotes de imagens pretas do tamanho de entrada (detecta modelos de lote fixo)."""
+        images = [np.zeros((self.input_size[1], self.input_size[0], 3), dtype=np.uint8)] * batch_size
+        start_time = time.time()
+        for _ in range(runs):
+            self.detect_batch(images)
+        logger.info(f"Detector aquecido em {time.time() - start_time:.2f}s "
+                    f"({runs} inferências, lote {batch_size}, {'em lote' if self.batched else 'uma por imagem'})")
+
+    def _label(self, class_id):
+        return self.labels[class_id] if 0 <= class_id < len(self.labels) else str(class_id)
+
+    def detect_batch(self, images):
+        """Executa uma única inferência para o lote e separa as detecções por imagem.
+
+        Se o modelo recusar o lote (por exemplo, exportado com lote fixo de 1), passa a
+        executar uma inferência por imagem.
+        """
+        if len(images) > 1 and self.batched:
+            try:
+                return self._forward(images)
+            except cv2.error as e:
+                self.batched = False
+                logger.warning(f"Modelo não aceita lotes de {len(images)} imagens, usando uma inferência "
+                               f"por imagem: {str(e)}")
+        if len(images) > 1:
+            return [self._forward([image])[0] for image in images]
+        return self._forward(images)
+
+    def _forward(self, images):
+        blob = cv2.dnn.blobFromImages(images, self.scale, self.input_size, self.mean, self.swap_rb, crop=False)
+        self.net.setInput(blob)
+        output = self.net.forward()
+
+        results = [[] for _ in images]
+        if output.ndim == 4 and output.shape[0] == len(images) > 1:
+            # Saída por imagem: o índice do lote é a primeira dimensão
+            rows = ((index, row) for index in range(len(images)) for row in output[index].reshape(-1, 7))
+        else:
+            # Saída única do SSD: o índice do lote vem na primeira coluna
+            rows = ((int(row[0]), row) for row in output.reshape(-1, 7))
+        for index, row in rows:
+            if not 0 <= index < len(images):
+                continue
+            box = tuple(float(min(max(value, 0.0), 1.0)) for value in row[3:7])
+            results[index].append((self._label(int(row[1])), float(row[2]), box))
+        return results
+
+
+class BatchingDetector:
+    """Detector compartilhado que agrupa pedidos de vários frames e drones em lotes.
+
+    detect() bloqueia a thread que chama (o estágio de IA de cada drone) até o
+    resultado. Uma thread própria espera o primeiro pedido, aguarda até max_wait
+    segundos (o orçamento de latência) por mais pedidos, até max_batch, e executa
+    o lote de uma vez no backend, que só é usado por essa thread.
+    """
+
+    def __init__(self, backend, max_batch=8, max_wait=0.005):
+        """Inicializa o agrupador (o backend é carregado em start())."""
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = []
+        self.condition = threading.Condition()
+        self.is_ready = False
+        self.running = False
+        self.batches = 0
+        self.frames = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def start(self, warmup_runs=2):
+        """Carrega e aquece o backend e inicia a thread de lotes (bloqueante)."""
+        self.backend.load()
+        self.backend.warmup(warmup_runs, self.max_batch)
+        self.running = True
+        threading.Thread(target=self._run, name="detector-batcher", daemon=True).start()
+        self.is_ready = True
+
+    def stop(self):
+        """Encerra a thread de lotes."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def detect(self, image, timeout=DETECT_TIMEOUT):
+        """Enfileira uma imagem para o próximo lote e espera o resultado."""
+        future = Future()
+        with self.condition:
+            self.pending.append((image, future))
+            self.condition.notify()
+        return future.result(timeout)
+
+    def _next_batch(self):
+        """Espera o primeiro pedido e junta os que chegarem dentro do orçamento de latência."""
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait(0.5)
+            deadline = time.monotonic() + self.max_wait
+            while self.running and len(self.pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            return batch
+
+    def _run(self):
+        """Thread de lotes: uma inferência por lote, resultados entregues a cada pedido."""
+        while self.running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            start_time = time.monotonic()
+            try:
+                results = self.backend.detect_batch([image for image, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Erro na inferência do lote ({len(batch)} frames): {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            elapsed = time.monotonic() - start_time
+            self.batches += 1
+            self.frames += len(batch)
+            self.busy_seconds += elapsed
+            DETECTOR_BATCH_SIZE.observe(len(batch), backend=self.backend.name)
+            DETECTOR_BATCH_SECONDS.observe(elapsed, backend=self.backend.name)
+
+    def get_stats(self):
+        """Retorna o tamanho médio dos lotes e o tempo de inferência."""
+        return {
+            "backend": self.backend.name,
+            "ready": self.is_ready,
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch": round(self.frames / self.batches, 2) if self.batches else None,
+            "avg_batch_ms": round(1000 * self.busy_seconds / self.batches, 2) if self.batches else None,
+            "pending": len(self.pending),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "errors": self.errors,
+        }
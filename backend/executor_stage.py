@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("executor-stage")
+
+
+class StageBusyError(RuntimeError):
+    """Erro lançado quando a fila de um estágio atinge o limite de profundidade."""
+
+
+class ExecutorStage:
+    """Estágio de execução com pool de threads limitado para trabalho bloqueante (OpenCV, IA)."""
+
+    def __init__(self, name, max_workers=2, max_pending=4):
+        """Inicializa o estágio com o número de threads e a profundidade máxima da fila."""
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"stage-{name}")
+        self.pending = {}
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def queue_depth(self):
+        """Retorna o número de tarefas enfileiradas ou em execução."""
+        return sum(len(futures) for futures in self.pending.values())
+
+    def is_busy(self):
+        """Indica se o estágio não aceita novas tarefas."""
+        return self.queue_depth() >= self.max_pending
+
+    async def run(self, func, *args, owner=None):
+        """Executa func(*args) no pool sem bloquear o event loop.
+
+        O owner (por exemplo, o id do cliente) permite cancelar as tarefas
+        pendentes quando o cliente se desconecta.
+        """
+        if self.is_busy():
+            self.rejected += 1
+            raise StageBusyError(f"Estágio {self.name} ocupado ({self.queue_depth()} tarefas pendentes)")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, func, *args)
+        self.pending.setdefault(owner, set()).add(future)
+        try:
+            result = await future
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            futures = self.pending.get(owner)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self.pending[owner]
+
+    def cancel_owner(self, owner):
+        """Cancela as tarefas de um owner que ainda não começaram a executar."""
+        for future in list(self.pending.get(owner, ())):
+            future.cancel()
+
+    def shutdown(self):
+        """Encerra o pool de threads, descartando tarefas não iniciadas."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self):
+        """Retorna estatísticas do estágio."""
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.queue_depth(),
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+        }
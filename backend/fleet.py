@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from command_dispatch import CommandScheduler
+from control_loop import MoveControlLoop
+from executor_stage import StageBusyError
+from frame_cache import EncodedFrameCache
+from frame_hub import FrameHub
+from frame_protocol import FramePacket
+from metrics import REGISTRY
+from startup import ComponentReadiness
+from telemetry_stream import TelemetrySampler
+
+logger = logging.getLogger("fleet")
+
+FRAMES_SKIPPED = REGISTRY.counter("drone_frames_skipped_total", "Ticks do produtor pulados")
+
+
+def build_telemetry_snapshot(drone_controller, ai_controller):
+    """Monta o snapshot completo de telemetria (estado do drone, IA e modo)."""
+    # Obter dados de telemetria do drone
+    telemetry = drone_controller.get_telemetry()
+
+    # Obter status da IA
+    ai_status = ai_controller.get_ai_status()
+
+    return {
+        "state": {
+            "bateria": telemetry["battery"],
+            "altura": telemetry["altitude"],
+            "temperatura": telemetry["temperature"],
+            "atitude": {
+                "pitch": telemetry["attitude"]["pitch"],
+                "roll": telemetry["attitude"]["roll"],
+                "yaw": telemetry["attitude"]["yaw"],
+            },
+            "is_flying": telemetry["is_flying"],
+            "is_recording": telemetry["is_recording"],
+        },
+        "ai": {
+            "enabled": ai_status["enabled"],
+            "mode": ai_status["mode"],
+            "detected_objects": ai_status["detected_objects"],
+        },
+        "mode": drone_controller.current_mode,
+    }
+
+
+class DronePipeline:
+    """Pipeline de um drone: controladores, cache de frames, hub, agendador de comandos e loop de controle."""
+
+    def __init__(self, drone_id, index, drone_controller, ai_controller, video_processor,
+                 command_registry, encode, encode_stage, queue_size=2, control_loop_hz=20.0,
+                 telemetry_interval=0.01, fps=30):
+        """Monta o pipeline do drone (nada é iniciado até start())."""
+        self.drone_id = drone_id
+        self.index = index
+        self.drone_controller = drone_controller
+        self.ai_controller = ai_controller
+        self.video_processor = video_processor
+        self.replay_source = None
+        # Gravador de vídeo em segundo plano (criado no primeiro comando de gravação) e a tarefa que o alimenta
+        self.video_recorder = None
+        self.recorder_feed = None
+        # Controladores remotos (proxies do worker de captura, no modo gateway): cada chamada é IPC bloqueante
+        self.remote_controllers = False
+        self.fps = fps
+        self.readiness = ComponentReadiness(drone_id, ("drone", "ai", "video"))
+
+        self.frame_cache = EncodedFrameCache(encode, encode_stage)
+        self.frame_hub = FrameHub(queue_size=queue_size)
+        self.command_scheduler = CommandScheduler(drone_id, command_registry, context=self)
+        self.control_loop = MoveControlLoop(drone_controller, control_loop_hz) if control_loop_hz > 0 else None
+        self.telemetry_sampler = TelemetrySampler(lambda: self.build_telemetry_snapshot(),
+                                                  min_interval=telemetry_interval)
+        self.producer = None
+
+    def build_telemetry_snapshot(self):
+        """Snapshot de telemetria do drone (na reprodução, o gravado junto com o frame)."""
+        if self.replay_source:
+            return self.replay_source.get_snapshot()
+        return build_telemetry_snapshot(self.drone_controller, self.ai_controller)
+
+    async def build_frame_packet(self, sequence, tier_names, frame_sequence, frame=None):
+        """Monta o pacote de frame com telemetria, codificando o JPEG uma única vez por frame e nível em uso."""
+        snapshot = self.build_telemetry_snapshot()
+
+        # O frame publicado é lido sem cópia e codificado fora do event loop; fontes que
+        # publicam só a sequência (reprodução, anel compartilhado) entregam o frame sob demanda,
+        # decodificado ou copiado no estágio de codificação
+        tier_names = sorted(tier_names)
+        encoded = await asyncio.gather(*[
+            self.frame_cache.get(frame_sequence, name, frame, self.video_processor.get_frame)
+            for name in tier_names
+        ])
+
+        return FramePacket(
+            sequence=sequence,
+            encodings=dict(zip(tier_names, encoded)),
+            state=snapshot["state"],
+            ai=snapshot["ai"],
+            mode=snapshot["mode"],
+            drone_id=self.drone_id,
+            drone_index=self.index,
+            captured_at=self.video_processor.frames.capture_time(frame_sequence),
+        )
+
+    async def produce_frames(self):
+        """Produz uma mensagem por frame novo da fonte e a distribui pelo hub do drone."""
+        sequence = 0
+        frame_sequence = 0
+        while True:
+            try:
+                # Esperar pelo próximo frame publicado; o tempo limite cobre a troca da fonte
+                # de vídeo durante a inicialização (por exemplo, pela reprodução de sessão)
+                latest = await self.video_processor.frames.wait_async(frame_sequence, timeout=1.0)
+                if latest is None:
+                    continue
+                frame_sequence, frame = latest
+
+                # Drones sem assinantes não codificam nada
+                if self.frame_hub.has_subscribers():
+                    sequence += 1
+                    self.frame_hub.publish(await self.build_frame_packet(
+                        sequence, self.frame_hub.active_tiers(), frame_sequence, frame))
+            except StageBusyError:
+                # Codificador saturado: pular este frame em vez de acumular atraso
+                FRAMES_SKIPPED.inc(reason="encoder_busy")
+            except Exception as e:
+                logger.error(f"Erro ao produzir frame do drone {self.drone_id}: {str(e)}")
+                await asyncio.sleep(1 / self.fps)
+
+    def start(self):
+        """Inicia o agendador de comandos, o loop de controle e o produtor de frames."""
+        self.command_scheduler.start()
+        if self.control_loop:
+            self.control_loop.start()
+        if self.producer is None:
+            self.producer = asyncio.create_task(self.produce_frames())
+
+    async def call(self, func, *args):
+        """Chama func(*args) de um controlador; com controladores remotos, a chamada roda fora do event loop."""
+        if self.remote_controllers:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def get_stats(self):
+        """Retorna o estado do pipeline do drone."""
+        return {
+            "index": self.index,
+            "video_source": self.video_processor.video_source,
+            "readiness": self.readiness.get_status(),
+            "capture": self.video_processor.get_capture_stats() if hasattr(self.video_processor, "get_capture_stats") else None,
+            "frame_hub": self.frame_hub.get_stats(),
+            "frame_cache": self.frame_cache.get_stats(),
+            "commands": self.command_scheduler.get_stats(),
+            "control_loop": self.control_loop.get_stats() if self.control_loop else None,
+            "replay": self.replay_source.get_stats() if self.replay_source else None,
+            "recording": self.video_recorder.get_stats() if self.video_recorder else None,
+        }
+
+
+class FleetRegistry:
+    """Registro dos drones servidos por este backend, indexado pelo id do drone."""
+
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self.drones = {}
+
+    def add(self, pipeline):
+        """Registra o pipeline de um drone."""
+        if pipeline.drone_id in self.drones:
+            raise ValueError(f"Drone {pipeline.drone_id} já registrado")
+        self.drones[pipeline.drone_id] = pipeline
+        return pipeline
+
+    def remove(self, drone_id):
+        """Remove um drone do registro."""
+        return self.drones.pop(drone_id, None)
+
+    def get(self, drone_id):
+        """Retorna o pipeline do drone, ou None se o id for desconhecido."""
+        return self.drones.get(drone_id)
+
+    @property
+    def default(self):
+        """Primeiro drone registrado (usado por clientes que não escolhem um drone)."""
+        return next(iter(self.drones.values()))
+
+    def __iter__(self):
+        return iter(list(self.drones.values()))
+
+    def __len__(self):
+        return len(self.drones)
+
+    def describe(self):
+        """Lista os drones disponíveis (id e índice usado no cabeçalho binário)."""
+        return [{"id": drone.drone_id, "index": drone.index} for drone in self]
+
+    def start(self):
+        """Inicia os pipelines de todos os drones."""
+        for drone in self:
+            drone.start()
+
+    def get_stats(self):
+        """Retorna o estado de cada drone."""
+        return {drone.drone_id: drone.get_stats() for drone in self}
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from adaptive_quality import TIERS_BY_NAME
+from image_pyramid import ImagePyramid
+from metrics import REGISTRY
+
+logger = logging.getLogger("frame-cache")
+
+# Níveis fixos de resolução que o cliente pode pedir em vez do nível adaptativo
+RESOLUTION_TIERS = {
+    "full": TIERS_BY_NAME["full"],
+    "half": {"name": "half", "quality": 60, "scale": 0.5},
+    "thumbnail": {"name": "thumbnail", "quality": 50, "max_width": 160},
+}
+
+# Todos os níveis que o cache sabe codificar
+ENCODE_TIERS = {**TIERS_BY_NAME, **RESOLUTION_TIERS}
+
+CACHE_LOOKUPS = REGISTRY.counter("drone_frame_cache_lookups_total", "Consultas ao cache de frames codificados")
+
+
+class EncodedFrameCache:
+    """Frames codificados do frame atual, por nível, versionados pela sequência do frame.
+
+    Cada nível é codificado na primeira vez em que é pedido; pedidos simultâneos do
+    mesmo nível compartilham a mesma codificação. Quando chega um frame com outra
+    sequência, todas as entradas anteriores são descartadas. O frame é guardado como
+    uma pirâmide (ImagePyramid): os níveis reduzidos (metade, miniatura, qualidade
+    adaptativa) reaproveitam as mesmas reduções em vez de redimensionar cada um.
+    Uma sequência nova com o mesmo array do frame anterior (cena estática) mantém
+    as codificações já feitas. Fontes que só publicam a sequência (reprodução, anel
+    compartilhado) têm o frame carregado no estágio, fora do event loop.
+    """
+
+    def __init__(self, encode, stage):
+        """Inicializa o cache com a função de codificação e o estágio onde ela roda."""
+        self.encode = encode
+        self.stage = stage
+        self.sequence = None
+        # Future com a pirâmide do frame atual (pronta de imediato quando o frame é publicado)
+        self.pyramid = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reused = 0
+
+    def _current_frame(self):
+        """Frame da pirâmide atual, ou None se ainda não foi carregado."""
+        if self.pyramid is None or not self.pyramid.done() or self.pyramid.exception() is not None:
+            return None
+        return self.pyramid.result().frame
+
+    def _advance(self, sequence, frame, load_frame):
+        """Troca para a sequência indicada, descartando as codificações do frame anterior."""
+        if sequence == self.sequence:
+            return
+        self.sequence = sequence
+        if frame is not None and frame is self._current_frame():
+            # Mesmo conteúdo republicado: as codificações continuam válidas
+            self.reused += 1
+            return
+        self.evictions += len(self.entries)
+        self.entries = {}
+        if frame is not None:
+            self.pyramid = asyncio.get_running_loop().create_future()
+            self.pyramid.set_result(ImagePyramid(frame))
+        else:
+            self.pyramid = asyncio.ensure_future(self.stage.run(lambda: ImagePyramid(load_frame())))
+
+    async def _encode(self, pyramid, tier):
+        return await self.stage.run(self.encode, await pyramid, tier)
+
+    async def get(self, sequence, tier_name, frame=None, load_frame=None):
+        """Retorna o EncodedFrame do nível para o frame da sequência, codificando se necessário.
+
+        frame é o frame publicado; sem ele, load_frame é chamado no estágio, e só
+        quando a sequência muda.
+        """
+        self._advance(sequence, frame, load_frame)
+        pyramid = self.pyramid
+        entry = self.entries.get(tier_name)
+        if entry is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result="miss")
+            entry = asyncio.ensure_future(self._encode(pyramid, ENCODE_TIERS[tier_name]))
+            self.entries[tier_name] = entry
+        else:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+
+        try:
+            # shield: o cancelamento de quem espera não cancela a codificação compartilhada
+            return await asyncio.shield(entry)
+        except Exception:
+            # Falhas (por exemplo, estágio saturado) não ficam em cache
+            if self.entries.get(tier_name) is entry:
+                del self.entries[tier_name]
+            if pyramid is self.pyramid and pyramid.done() and pyramid.exception() is not None:
+                # O carregamento do frame falhou: a próxima consulta tenta de novo
+                self.sequence = None
+            raise
+
+    def get_stats(self):
+        """Retorna a sequência atual, os níveis em cache e as taxas de acerto."""
+        lookups = self.hits + self.misses
+        return {
+            "sequence": self.sequence,
+            "tiers": sorted(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "reused_frames": self.reused,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
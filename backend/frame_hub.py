@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from frame_protocol import TRANSPORT_JSON
+from serializer import get_serializer
+
+logger = logging.getLogger("frame-hub")
+
+
+class FrameSubscription:
+    """Fila limitada de um assinante do hub, descartando a mensagem mais antiga quando cheia."""
+
+    def __init__(self, client_id, quality, max_size=2):
+        """Inicializa a assinatura de um cliente."""
+        self.client_id = client_id
+        self.quality = quality
+        self.transport = TRANSPORT_JSON
+        self.serializer = get_serializer()
+        self.resolution = None
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.delivered = 0
+        self.dropped = 0
+
+    def tier_name(self):
+        """Nível de codificação usado pelo cliente: a resolução fixa pedida ou o nível adaptativo."""
+        return self.resolution or self.quality.tier["name"]
+
+    def push(self, message):
+        """Enfileira uma mensagem sem bloquear o produtor."""
+        if self.queue.full():
+            # Política drop-oldest: um cliente lento só perde frames antigos
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        """Aguarda a próxima mensagem destinada a este assinante."""
+        message = await self.queue.get()
+        self.delivered += 1
+        return message
+
+    def get_stats(self):
+        """Retorna estatísticas de entrega da assinatura."""
+        return {
+            "transport": self.transport,
+            "codec": self.serializer.name,
+            "resolution": self.tier_name(),
+            "queued": self.queue.qsize(),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "quality": self.quality.get_stats(),
+        }
+
+
+class FrameHub:
+    """Distribui cada pacote de frame, construído uma única vez, para todos os assinantes."""
+
+    def __init__(self, queue_size=2):
+        """Inicializa o hub de distribuição."""
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.published = 0
+
+    def subscribe(self, client_id, quality):
+        """Registra um novo assinante com seu controle de qualidade e retorna sua assinatura."""
+        subscription = FrameSubscription(client_id, quality, self.queue_size)
+        self.subscribers.add(subscription)
+        logger.info(f"Assinante {client_id} registrado ({len(self.subscribers)} ativos)")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove um assinante do hub."""
+        self.subscribers.discard(subscription)
+        logger.info(f"Assinante {subscription.client_id} removido ({len(self.subscribers)} ativos)")
+
+    def has_subscribers(self):
+        """Indica se há algum assinante ativo."""
+        return bool(self.subscribers)
+
+    def active_tiers(self):
+        """Retorna os níveis de qualidade em uso pelos assinantes."""
+        return {subscription.tier_name() for subscription in self.subscribers}
+
+    def publish(self, packet):
+        """Entrega o mesmo pacote a todos os assinantes."""
+        self.published += 1
+        for subscription in self.subscribers:
+            subscription.push(packet)
+
+    def get_client_stats(self):
+        """Retorna as estatísticas de cada assinante, indexadas pelo id do cliente."""
+        return {str(s.client_id): s.get_stats() for s in self.subscribers}
+
+    def get_stats(self):
+        """Retorna estatísticas agregadas do hub."""
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in self.subscribers),
+        }
@@ -0,0 +1,57 @@
+import logging
+import sys
+import numpy as np
+
+logger = logging.getLogger("frame-pool")
+
+
+class FramePool:
+    """Pool de arrays de frame reaproveitados pela entrada do pipeline de vídeo.
+
+    Frames publicados são lidos sem cópia (cache de codificação, gravador, worker
+    do gateway), então um buffer só volta a ser usado quando ninguém mais o
+    referencia: nem o publicador, nem os estágios, nem quem ainda o está
+    codificando. A contagem de referências do CPython indica isso sem exigir que
+    cada consumidor devolva o buffer. Com todos os buffers em uso e o pool cheio,
+    um array avulso é alocado (e contado).
+    """
+
+    def __init__(self, shape, max_buffers=12):
+        """Inicializa o pool vazio (os buffers são alocados sob demanda, até max_buffers)."""
+        self.shape = shape
+        self.max_buffers = max_buffers
+        self.buffers = [np.empty(shape, dtype=np.uint8)]
+        # Referências de um buffer livre (só a lista do pool), medidas do mesmo jeito que em acquire()
+        self.free_refs = sys.getrefcount(self.buffers[0])
+        self.next_index = 0
+        self.reused = 0
+        self.overflow = 0
+
+    def acquire(self):
+        """Retorna um buffer gravável que ninguém mais referencia (chamado só pela entrada do pipeline)."""
+        count = len(self.buffers)
+        for step in range(count):
+            index = (self.next_index + step) % count
+            if sys.getrefcount(self.buffers[index]) <= self.free_refs:
+                self.next_index = (index + 1) % count
+                buffer = self.buffers[index]
+                # Frames publicados ficam somente leitura; o pool é dono da memória
+                buffer.flags.writeable = True
+                self.reused += 1
+                return buffer
+
+        buffer = np.empty(self.shape, dtype=np.uint8)
+        if count < self.max_buffers:
+            self.buffers.append(buffer)
+        else:
+            self.overflow += 1
+        return buffer
+
+    def get_stats(self):
+        """Retorna o tamanho do pool e quantos frames reaproveitaram um buffer."""
+        return {
+            "buffers": len(self.buffers),
+            "max_buffers": self.max_buffers,
+            "reused": self.reused,
+            "overflow": self.overflow,
+        }
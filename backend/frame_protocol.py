@@ -0,0 +1,108 @@
+import struct
+import time
+from metrics import REGISTRY
+
+# Métricas de serialização das mensagens de frame
+SERIALIZE_SECONDS = REGISTRY.histogram("drone_serialize_seconds", "Tempo de serialização das mensagens enviadas")
+
+# Cabeçalho binário fixo dos frames (big-endian, 20 bytes):
+# versão (u8), codec (u8), sequência (u32), instante da captura em ms (u64), largura (u16), altura (u16),
+# índice do drone na frota (u16). A versão 1 (18 bytes) não tinha o índice do drone.
+# A versão fica abaixo de 0x80 para distinguir frames de mensagens msgpack (mapas começam em 0x80).
+FRAME_HEADER = struct.Struct(">BBIQHHH")
+FRAME_HEADER_V1 = struct.Struct(">BBIQHH")
+FRAME_HEADER_VERSION = 2
+
+# Codecs suportados no campo "codec" do cabeçalho
+CODEC_JPEG = 1
+
+# Modos de transporte negociados na mensagem "connect"
+TRANSPORT_JSON = "json"
+TRANSPORT_BINARY = "binary"
+
+
+def pack_frame_header(sequence, timestamp_ms, width, height, codec=CODEC_JPEG, drone_index=0):
+    """Monta o cabeçalho binário de um frame."""
+    return FRAME_HEADER.pack(FRAME_HEADER_VERSION, codec, sequence & 0xFFFFFFFF,
+                             timestamp_ms, width, height, drone_index)
+
+
+def unpack_frame_header(data):
+    """Lê o cabeçalho de um frame binário (versão 1 ou 2) e retorna seus campos e o payload."""
+    if data[0] == 1:
+        version, codec, sequence, timestamp_ms, width, height = FRAME_HEADER_V1.unpack_from(data)
+        drone_index, size = 0, FRAME_HEADER_V1.size
+    else:
+        version, codec, sequence, timestamp_ms, width, height, drone_index = FRAME_HEADER.unpack_from(data)
+        size = FRAME_HEADER.size
+    return {
+        "version": version,
+        "codec": codec,
+        "sequence": sequence,
+        "timestamp": timestamp_ms,
+        "width": width,
+        "height": height,
+        "drone_index": drone_index,
+    }, memoryview(data)[size:]
+
+
+class EncodedFrame:
+    """Bytes de um frame codificado em um nível de qualidade, com suas dimensões."""
+
+    def __init__(self, data, width, height, codec=CODEC_JPEG):
+        """Inicializa o frame codificado."""
+        self.data = data
+        self.width = width
+        self.height = height
+        self.codec = codec
+
+
+class FramePacket:
+    """Frame codificado e telemetria de um tick, serializados sob demanda uma única vez por formato e nível."""
+
+    def __init__(self, sequence, encodings, state, ai, mode, drone_id="default", drone_index=0, captured_at=None):
+        """Inicializa o pacote com os frames codificados (por nível) e a telemetria do tick.
+
+        captured_at é o instante da captura do frame (epoch s), enviado para medir a latência
+        de ponta a ponta; sem ele, vale o instante de criação do pacote.
+        """
+        self.sequence = sequence
+        self.drone_id = drone_id
+        self.drone_index = drone_index
+        self.encodings = encodings
+        self.state = state
+        self.ai = ai
+        self.mode = mode
+        self.created_at = time.time()
+        self.captured_at = captured_at or self.created_at
+        self._messages = {}
+        self._binary_frames = {}
+
+    def frame_message(self, serializer, tier):
+        """Mensagem "frame" com frame e telemetria (JPEG em base64 no JSON, bytes no msgpack)."""
+        key = (serializer.name, tier)
+        message = self._messages.get(key)
+        if message is None:
+            with SERIALIZE_SECONDS.time(format=serializer.name):
+                message = serializer.envelope("frame", {
+                    "drone_id": self.drone_id,
+                    "frame": serializer.frame_payload(self.encodings[tier].data),
+                    "state": self.state,
+                    "ai": self.ai,
+                    "mode": self.mode,
+                    "captured_at": int(self.captured_at * 1000),
+                })
+            self._messages[key] = message
+        return message
+
+    def binary_frame(self, tier):
+        """Mensagem binária: cabeçalho fixo seguido dos bytes do JPEG."""
+        message = self._binary_frames.get(tier)
+        if message is None:
+            with SERIALIZE_SECONDS.time(format="binary"):
+                encoded = self.encodings[tier]
+                header = pack_frame_header(self.sequence, int(self.captured_at * 1000),
+                                           encoded.width, encoded.height, encoded.codec, self.drone_index)
+                message = header + bytes(encoded.data)
+            self._binary_frames[tier] = message
+        return message
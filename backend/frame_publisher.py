@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+# Instantes de captura guardados para as sequências mais recentes
+CAPTURE_TIMES = 16
+
+
+class FramePublisher:
+    """Publicação versionada do último frame de uma fonte de vídeo.
+
+    Cada frame publicado recebe um número de sequência crescente e fica somente
+    leitura: consumidores recebem o próprio array, sem cópia, e nunca o veem mudar.
+    Consumidores podem esperar por um frame mais novo que o último visto, em uma
+    thread (wait) ou no event loop (wait_async). Fontes que decodificam sob demanda
+    publicam frame=None e só avisam a nova sequência. Cada publicação guarda o
+    instante da captura do frame, para medir a latência de ponta a ponta.
+    """
+
+    def __init__(self):
+        """Inicializa a publicação sem nenhum frame."""
+        self.sequence = 0
+        self.frame = None
+        self.condition = threading.Condition()
+        self.waiters = []
+        self.capture_times = deque(maxlen=CAPTURE_TIMES)
+
+    def publish(self, frame, sequence=None, captured_at=None):
+        """Publica um frame (ou só uma nova sequência) e acorda quem espera por ele.
+
+        captured_at é o instante da captura (epoch s); sem ele, vale o da publicação.
+        """
+        if frame is not None:
+            frame.flags.writeable = False
+        with self.condition:
+            self.frame = frame
+            self.sequence = sequence if sequence is not None else self.sequence + 1
+            self.capture_times.append((self.sequence, captured_at or time.time()))
+            self.condition.notify_all()
+            waiters, self.waiters = self.waiters, []
+
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # Event loop do consumidor já foi encerrado
+                pass
+        return self.sequence
+
+    def latest(self):
+        """Retorna (sequência, frame) do último frame publicado."""
+        with self.condition:
+            return self.sequence, self.frame
+
+    def wait(self, after_sequence, timeout=None):
+        """Bloqueia até haver um frame mais novo que after_sequence; retorna (sequência, frame) ou None."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.sequence > after_sequence, timeout):
+                return None
+            return self.sequence, self.frame
+
+    async def wait_async(self, after_sequence, timeout=None):
+        """Versão assíncrona de wait(), sem ocupar uma thread por consumidor."""
+        loop = asyncio.get_running_loop()
+        with self.condition:
+            if self.sequence > after_sequence:
+                return self.sequence, self.frame
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self.condition:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+        return self.latest()
+
+    def capture_time(self, sequence):
+        """Retorna o instante de captura (epoch s) de uma sequência recente, ou None."""
+        for published, captured_at in reversed(self.capture_times):
+            if published == sequence:
+                return captured_at
+        return None
+
+    def get_stats(self):
+        """Retorna a sequência atual e quantos consumidores assíncronos aguardam."""
+        return {"sequence": self.sequence, "waiters": len(self.waiters)}
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
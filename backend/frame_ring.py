@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger("frame-ring")
+
+
+class FrameRing:
+    """Anel de buffers de frame pré-alocados entre a thread de captura e a de processamento.
+
+    A captura escreve sempre no próximo slot, sem esperar pelo consumidor; o consumidor
+    lê apenas o slot mais novo e descarta os que ficaram para trás. Cada slot guarda a
+    sequência do frame que contém (-1 enquanto está sendo escrito), o que permite
+    detectar uma leitura sobrescrita no meio da cópia e repeti-la.
+    """
+
+    def __init__(self, height, width, slots=4, channels=3):
+        """Aloca os buffers do anel (slots >= 2)."""
+        if slots < 2:
+            raise ValueError("O anel precisa de pelo menos 2 slots")
+        self.shape = (height, width, channels)
+        self.buffers = [np.zeros(self.shape, dtype=np.uint8) for _ in range(slots)]
+        self.slot_sequences = [-1] * slots
+        self.slot_timestamps = [0.0] * slots
+        self.latest_sequence = 0
+        # Instante de captura (epoch s) do último frame lido por read_newest (um único consumidor)
+        self.read_timestamp = None
+        self.condition = threading.Condition()
+
+        # Contadores para diagnóstico
+        self.published = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.torn_reads = 0
+
+    @property
+    def slots(self):
+        return len(self.buffers)
+
+    def reserve(self):
+        """Retorna (sequência, buffer) do próximo slot a ser escrito pela captura."""
+        sequence = self.latest_sequence + 1
+        index = sequence % self.slots
+        # Invalidar o slot antes de sobrescrevê-lo: leitores em andamento repetem a leitura
+        self.slot_sequences[index] = -1
+        return sequence, self.buffers[index]
+
+    def commit(self, sequence, timestamp=None):
+        """Publica o slot escrito (com o instante da captura, epoch s) e acorda o consumidor."""
+        with self.condition:
+            self.slot_timestamps[sequence % self.slots] = timestamp or time.time()
+            self.slot_sequences[sequence % self.slots] = sequence
+            self.latest_sequence = sequence
+            self.published += 1
+            self.condition.notify_all()
+
+    def read_newest(self, last_sequence, out, timeout=None):
+        """Copia para out o frame mais novo posterior a last_sequence.
+
+        Retorna a sequência lida, ou None se nenhum frame novo chegou no tempo limite.
+        Frames publicados e nunca lidos entram na contagem de descartados.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.latest_sequence > last_sequence, timeout):
+                return None
+
+        while True:
+            sequence = self.latest_sequence
+            index = sequence % self.slots
+            np.copyto(out, self.buffers[index])
+            timestamp = self.slot_timestamps[index]
+            if self.slot_sequences[index] == sequence:
+                break
+            # A captura deu a volta no anel durante a cópia
+            self.torn_reads += 1
+
+        self.read_timestamp = timestamp
+        if last_sequence > 0:
+            self.dropped += max(0, sequence - last_sequence - 1)
+        self.consumed += 1
+        return sequence
+
+    def get_stats(self):
+        """Retorna a ocupação e os contadores do anel."""
+        return {
+            "slots": self.slots,
+            "latest_sequence": self.latest_sequence,
+            "published": self.published,
+            "consumed": self.consumed,
+            "dropped": self.dropped,
+            "torn_reads": self.torn_reads,
+        }
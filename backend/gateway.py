@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from frame_publisher import FramePublisher
+from shm_ring import SharedFrameRing
+
+logger = logging.getLogger("gateway")
+
+# Intervalo de verificação de novos frames no worker de captura
+CAPTURE_POLL_INTERVAL = 0.005
+# Tentativas de leitura de um slot que o worker sobrescreveu durante a cópia
+READ_ATTEMPTS = 3
+
+
+class SharedFrameSource:
+    """Substitui o VideoProcessor nos gateways: lê o último frame do anel.
+
+    O frame é copiado do slot uma vez por sequência e a cópia só é aceita se o slot
+    não foi sobrescrito durante ela (is_current); o encoder e a pirâmide, que rodam
+    depois de um await, nunca veem um frame rasgado.
+    """
+
+    video_source = "shared_memory"
+
+    def __init__(self, ring):
+        """Inicializa a fonte a partir de um anel já anexado."""
+        self.ring = ring
+        self.width = ring.width
+        self.height = ring.height
+        self.meta = b""
+        self.meta_sequence = 0
+        self.frame = None
+        self.frame_sequence = 0
+        self.torn_reads = 0
+        # Avisa a chegada de frames do worker (a sequência é a do anel; o frame é lido sob demanda)
+        self.frames = FramePublisher()
+
+    @property
+    def frame_count(self):
+        """Número de frames publicados pelo worker de captura."""
+        return self.ring.latest_sequence
+
+    def start(self):
+        """Inicia a thread que acompanha o anel e publica cada nova sequência."""
+        threading.Thread(target=self._watch_ring, daemon=True).start()
+
+    def _watch_ring(self):
+        while True:
+            latest = self.ring.read_latest()
+            if latest is not None and latest[0] != self.frames.sequence:
+                sequence, _, _, timestamp_ms = latest
+                self.frames.publish(None, sequence=sequence, captured_at=timestamp_ms / 1000)
+            time.sleep(CAPTURE_POLL_INTERVAL)
+
+    def read_meta(self):
+        """Atualiza os metadados (telemetria) do último slot, sem copiar o frame."""
+        latest = self.ring.read_latest()
+        if latest is None:
+            return
+        sequence, _, meta, _ = latest
+        if sequence != self.meta_sequence and self.ring.is_current(sequence):
+            self.meta_sequence = sequence
+            self.meta = meta
+
+    def read(self):
+        """Retorna (sequência, cópia somente leitura do frame) do último slot, ou None."""
+        for _ in range(READ_ATTEMPTS):
+            latest = self.ring.read_latest()
+            if latest is None:
+                break
+            sequence, view, meta, _ = latest
+            if sequence == self.frame_sequence:
+                return sequence, self.frame
+            frame = view.copy()
+            if not self.ring.is_current(sequence):
+                # O worker voltou a este slot durante a cópia: tentar o slot mais novo
+                self.torn_reads += 1
+                continue
+            frame.flags.writeable = False
+            self.frame, self.frame_sequence = frame, sequence
+            if sequence != self.meta_sequence:
+                self.meta_sequence = sequence
+                self.meta = meta
+            return sequence, frame
+        return (self.frame_sequence, self.frame) if self.frame is not None else None
+
+    def get_capture_stats(self):
+        """Retorna a sequência do anel e as leituras descartadas por sobrescrita."""
+        return {"source": self.video_source, "sequence": self.frame_sequence, "torn_reads": self.torn_reads}
+
+    def get_frame(self):
+        """Retorna o frame atual (somente leitura)."""
+        latest = self.read()
+        if latest is None:
+            return None
+        return latest[1]
+
+
+class RemoteObject:
+    """Proxy de um controlador que vive no worker de captura, acessado por um Pipe."""
+
+    def __init__(self, connection, lock, target):
+        """Inicializa o proxy e descobre quais atributos remotos são métodos."""
+        self._connection = connection
+        self._lock = lock
+        self._target = target
+        self._methods = set(self._request("describe", None))
+
+    def _request(self, action, name, *args):
+        with self._lock:
+            self._connection.send((self._target, action, name, args))
+            ok, value = self._connection.recv()
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._methods:
+            return lambda *args: self._request("call", name, *args)
+        return self._request("get", name)
+
+
+def _serve_rpc(connection, targets):
+    """Atende chamadas de um gateway aos controladores do worker de captura."""
+    while True:
+        try:
+            target_name, action, name, args = connection.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            target = targets[target_name]
+            if action == "describe":
+                value = [attr for attr in dir(target) if not attr.startswith("_") and callable(getattr(target, attr))]
+            elif action == "call":
+                value = getattr(target, name)(*args)
+            else:
+                value = getattr(target, name)
+            connection.send((True, value))
+        except Exception as e:
+            connection.send((False, str(e)))
+
+
+def run_capture_worker(server, ring_name, connections, ready):
+    """Processo de captura/IA: publica frames e telemetria no anel e atende os gateways."""
+    server.initialize_components()
+    drone = server.fleet.default
+    processor = drone.video_processor
+    ring = SharedFrameRing.create(ring_name, processor.width, processor.height)
+
+    targets = {"drone": drone.drone_controller, "ai": drone.ai_controller, "readiness": drone.readiness}
+    for connection in connections:
+        threading.Thread(target=_serve_rpc, args=(connection, targets), daemon=True).start()
+    ready.set()
+
+    last_sequence = 0
+    try:
+        while True:
+            latest = processor.frames.wait(last_sequence, timeout=1.0)
+            if latest is None:
+                continue
+            last_sequence, frame = latest
+            try:
+                meta = json.dumps(drone.build_telemetry_snapshot()).encode("utf-8")
+                captured_at = processor.frames.capture_time(last_sequence)
+                ring.publish(frame if frame is not None else processor.get_frame(), meta,
+                             int(captured_at * 1000) if captured_at else None)
+            except Exception as e:
+                logger.error(f"Erro ao publicar frame no anel: {str(e)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def run_gateway(server, index, ring_name, connection):
+    """Processo gateway: serve WebSocket na porta compartilhada lendo frames do anel."""
+    ring = SharedFrameRing.attach(ring_name)
+    source = SharedFrameSource(ring)
+    source.start()
+    lock = threading.Lock()
+
+    # Controladores passam a ser proxies do worker de captura
+    drone = server.fleet.default
+    drone.video_processor = source
+    drone.drone_controller = RemoteObject(connection, lock, "drone")
+    drone.ai_controller = RemoteObject(connection, lock, "ai")
+    # Chamadas aos proxies fazem IPC bloqueante: comandos e loop de controle as fazem fora do event loop
+    drone.remote_controllers = True
+    if drone.control_loop:
+        drone.control_loop.drone_controller = drone.drone_controller
+        drone.control_loop.offload = True
+
+    # Telemetria vem dos metadados publicados junto com o frame, sem ida ao worker
+    snapshot_cache = {"sequence": None, "snapshot": None}
+
+    def build_telemetry_snapshot():
+        source.read_meta()
+        if snapshot_cache["sequence"] != source.meta_sequence:
+            snapshot_cache["sequence"] = source.meta_sequence
+            snapshot_cache["snapshot"] = json.loads(source.meta) if source.meta else None
+        if snapshot_cache["snapshot"] is None:
+            raise RuntimeError("Nenhum frame publicado pelo worker de captura")
+        return snapshot_cache["snapshot"]
+
+    drone.build_telemetry_snapshot = build_telemetry_snapshot
+
+    # Estado real dos componentes no worker de captura (já inicializados quando ele sinaliza "pronto")
+    worker_status = RemoteObject(connection, lock, "readiness").get_status()
+    for name, entry in worker_status["components"].items():
+        drone.readiness.set_state(name, entry["state"], error=entry.get("error"),
+                                  seconds=entry.get("seconds"), detail=entry.get("detail") or "capture_worker")
+
+    metrics_port = server.METRICS_PORT + index if server.METRICS_PORT > 0 else 0
+    logger.info(f"Gateway {index} (pid {os.getpid()}) anexado ao anel {ring_name}")
+    try:
+        asyncio.run(server.serve(reuse_port=True, metrics_port=metrics_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def run_multiprocess(server, gateways):
+    """Inicia um worker de captura/IA e N gateways WebSocket compartilhando a porta."""
+    # O anel transporta um único drone: os demais da frota não são servidos neste modo
+    for drone in server.fleet:
+        if drone is not server.fleet.default:
+            logger.warning(f"Drone {drone.drone_id} ignorado no modo multiprocesso")
+            server.fleet.remove(drone.drone_id)
+
+    context = multiprocessing.get_context("fork")
+    ring_name = f"drone_frames_{os.getpid()}"
+
+    pipes = [context.Pipe() for _ in range(gateways)]
+    ready = context.Event()
+    worker = context.Process(target=run_capture_worker, name="capture-worker",
+                             args=(server, ring_name, [worker_end for worker_end, _ in pipes], ready))
+    worker.start()
+    if not ready.wait(timeout=60):
+        worker.terminate()
+        raise RuntimeError("Worker de captura não ficou pronto em 60s")
+
+    processes = [worker]
+    for index, (_, gateway_end) in enumerate(pipes):
+        process = context.Process(target=run_gateway, name=f"gateway-{index}",
+                                  args=(server, index, ring_name, gateway_end))
+        process.start()
+        processes.append(process)
+    logger.info(f"{gateways} gateways iniciados na porta {server.PORT} (SO_REUSEPORT)")
+
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+        # O worker encerrado por sinal não chega a remover o segmento
+        try:
+            segment = shared_memory.SharedMemory(name=ring_name)
+            segment.close()
+            segment.unlink()
+        except FileNotFoundError:
+            pass
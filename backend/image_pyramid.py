@@ -0,0 +1,60 @@
+import threading
+import cv2
+
+# Níveis da pirâmide: escala 1, 1/2 e 1/4
+PYRAMID_LEVELS = 3
+
+
+class ImagePyramid:
+    """Pirâmide de um frame (escala 1, 1/2 e 1/4), com níveis calculados sob demanda.
+
+    Cada nível é reduzido a partir do anterior uma única vez e reaproveitado por
+    todos os consumidores do mesmo frame (IA, níveis de codificação, miniaturas).
+    Escalas intermediárias partem do menor nível que ainda é maior que o pedido.
+    """
+
+    def __init__(self, frame, levels=PYRAMID_LEVELS):
+        """Cria a pirâmide; só o nível 0 (o próprio frame) existe de início."""
+        self.height, self.width = frame.shape[:2]
+        self.levels = [frame] + [None] * (levels - 1)
+        self.lock = threading.Lock()
+
+    @property
+    def frame(self):
+        """Frame em resolução completa."""
+        return self.levels[0]
+
+    def level(self, index):
+        """Retorna o nível index (0 = completo, cada nível com metade do lado do anterior)."""
+        image = self.levels[index]
+        if image is not None:
+            return image
+
+        with self.lock:
+            # Reduzir a partir do maior nível já calculado até chegar ao pedido
+            built = index
+            while self.levels[built] is None:
+                built -= 1
+            for current in range(built + 1, index + 1):
+                previous = self.levels[current - 1]
+                height, width = previous.shape[:2]
+                image = cv2.resize(previous, (max(1, width // 2), max(1, height // 2)),
+                                   interpolation=cv2.INTER_AREA)
+                image.flags.writeable = False
+                self.levels[current] = image
+            return self.levels[index]
+
+    def scaled(self, scale):
+        """Retorna o frame na escala indicada, reaproveitando o nível mais próximo."""
+        if scale >= 1.0:
+            return self.levels[0]
+        # Menor nível com escala >= pedida (nível i tem escala 1 / 2**i)
+        index = 0
+        while index + 1 < len(self.levels) and 0.5 ** (index + 1) >= scale:
+            index += 1
+        image = self.level(index)
+        if 0.5 ** index == scale:
+            return image
+        width = max(1, round(self.width * scale))
+        height = max(1, round(self.height * scale))
+        return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
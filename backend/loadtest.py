@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import websockets
+from frame_protocol import unpack_frame_header
+
+# Dependência opcional: psutil mede CPU/RSS também fora do Linux
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    """Retorna o percentil pct (0-100) de uma lista de valores."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values, scale=1.0):
+    """Resume uma série de medições (percentis, média e máximo)."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values) * scale, 3),
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p90": round(percentile(values, 90) * scale, 3),
+        "p99": round(percentile(values, 99) * scale, 3),
+        "max": round(max(values) * scale, 3),
+    }
+
+
+class ProcessSampler:
+    """Amostra periodicamente o uso de CPU e a memória residente do processo do servidor."""
+
+    def __init__(self, pid, interval=1.0):
+        """Inicializa o amostrador para o processo indicado."""
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent = []
+        self.rss_mb = []
+        self.clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.process = psutil.Process(pid) if psutil else None
+
+    def _read_proc(self):
+        """Lê tempo de CPU (s) e RSS (MB) via /proc."""
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self.clock_ticks
+        rss_mb = 0.0
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_mb = int(line.split()[1]) / 1024
+                    break
+        return cpu_seconds, rss_mb
+
+    def _read(self):
+        """Lê tempo de CPU (s) e RSS (MB) com psutil ou /proc."""
+        if self.process is not None:
+            times = self.process.cpu_times()
+            return times.user + times.system, self.process.memory_info().rss / (1024 * 1024)
+        return self._read_proc()
+
+    async def run(self):
+        """Coleta amostras até ser cancelado."""
+        try:
+            last_cpu, _ = self._read()
+        except Exception as e:
+            print(f"Não foi possível medir o processo {self.pid}: {e}")
+            return
+        last_time = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                cpu, rss = self._read()
+            except Exception:
+                return
+            now = time.monotonic()
+            self.cpu_percent.append((cpu - last_cpu) / (now - last_time) * 100)
+            self.rss_mb.append(rss)
+            last_cpu, last_time = cpu, now
+
+    def get_results(self):
+        """Retorna o resumo de CPU e memória."""
+        return {
+            "cpu_percent": summarize(self.cpu_percent),
+            "rss_mb": summarize(self.rss_mb),
+        }
+
+
+class ClientStats:
+    """Medições de um cliente simulado."""
+
+    def __init__(self, index):
+        """Inicializa as medições."""
+        self.index = index
+        self.frames = 0
+        self.frame_bytes = 0
+        self.frame_latency = []
+        self.command_rtt = []
+        self.errors = 0
+        self.connected_at = None
+        self.closed_at = None
+        self.error = None
+
+    def get_results(self):
+        """Retorna o resumo das medições do cliente."""
+        duration = (self.closed_at or time.monotonic()) - (self.connected_at or time.monotonic())
+        return {
+            "client": self.index,
+            "frames": self.frames,
+            "fps": round(self.frames / duration, 2) if duration > 0 else 0,
+            "kbps": round(self.frame_bytes * 8 / 1000 / duration, 1) if duration > 0 else 0,
+            "frame_latency_ms": summarize(self.frame_latency, 1000),
+            "command_rtt_ms": summarize(self.command_rtt, 1000),
+            "errors": self.errors,
+            "error": self.error,
+        }
+
+
+async def run_client(index, url, duration, binary, move_hz, stats):
+    """Conecta um cliente que fala o protocolo connect/comando, recebe frames e envia moves."""
+    pending_moves = []
+
+    async def send_moves(ws):
+        # Tráfego de joystick: moves alternando direção na taxa pedida
+        interval = 1.0 / move_hz
+        step = 0
+        while True:
+            await asyncio.sleep(interval)
+            step += 1
+            pending_moves.append(time.perf_counter())
+            await ws.send(json.dumps({
+                "command": "move",
+                "params": {"left_right": 20 if step % 2 else -20, "forward_backward": 0, "up_down": 0, "yaw": 0},
+            }))
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            stats.connected_at = time.monotonic()
+            await ws.send(json.dumps({"type": "connect", "useTello": False, "binary": binary}))
+            mover = asyncio.create_task(send_moves(ws)) if move_hz > 0 else None
+            deadline = time.monotonic() + duration
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    now_ms = time.time() * 1000
+
+                    if isinstance(message, bytes):
+                        header, payload = unpack_frame_header(message)
+                        stats.frames += 1
+                        stats.frame_bytes += len(payload)
+                        # Latência de ponta a ponta: o timestamp do cabeçalho é o da captura
+                        stats.frame_latency.append(max(0.0, now_ms - header["timestamp"]) / 1000)
+                        continue
+
+                    data = json.loads(message)
+                    kind = data.get("type")
+                    if kind == "frame":
+                        stats.frames += 1
+                        stats.frame_bytes += len(data.get("frame", ""))
+                        captured_ms = data.get("captured_at", data["timestamp"])
+                        stats.frame_latency.append(max(0.0, now_ms - captured_ms) / 1000)
+                    elif kind in ("command_result", "error") and data.get("command") == "move":
+                        # Moves têm a mesma prioridade e são respondidos em ordem
+                        if pending_moves:
+                            stats.command_rtt.append(time.perf_counter() - pending_moves.pop(0))
+                        if kind == "error":
+                            stats.errors += 1
+            finally:
+                if mover:
+                    mover.cancel()
+                stats.closed_at = time.monotonic()
+                await ws.send(json.dumps({"type": "disconnect"}))
+    except Exception as e:
+        stats.error = str(e)
+        stats.closed_at = stats.closed_at or time.monotonic()
+
+
+def wait_for_port(host, port, timeout):
+    """Aguarda até que a porta aceite conexões."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(port, log_path):
+    """Inicia backend/server.py localmente com a fonte de vídeo simulada."""
+    env = dict(os.environ)
+    env.update({
+        "BACKEND_HOST": "127.0.0.1",
+        "BACKEND_PORT": str(port),
+        "BACKEND_VIDEO_SOURCE": "simulation",
+        "BACKEND_METRICS_PORT": env.get("BACKEND_METRICS_PORT", "0"),
+    })
+    log_file = open(log_path, "w")
+    process = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "server.py")],
+                               cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    return process, log_file
+
+
+def get_build_id():
+    """Retorna o commit atual do repositório, se disponível."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+async def run_load_test(args):
+    """Executa uma rodada de carga e retorna o resultado."""
+    process = None
+    log_file = None
+    url = args.url
+    pid = args.pid
+
+    if not url:
+        process, log_file = start_server(args.port, args.server_log)
+        if not wait_for_port("127.0.0.1", args.port, args.startup_timeout):
+            process.terminate()
+            raise RuntimeError(f"Servidor não respondeu em {args.startup_timeout}s (veja {args.server_log})")
+        url = f"ws://127.0.0.1:{args.port}"
+        pid = process.pid
+
+    sampler = ProcessSampler(pid) if pid else None
+    sampler_task = asyncio.create_task(sampler.run()) if sampler else None
+
+    try:
+        stats = [ClientStats(i) for i in range(args.clients)]
+        tasks = []
+        for i, client_stats in enumerate(stats):
+            tasks.append(asyncio.create_task(run_client(
+                i, url, args.duration, args.binary, args.move_hz, client_stats)))
+            # Rampa de conexão para não abrir todos os sockets no mesmo instante
+            if args.ramp > 0:
+                await asyncio.sleep(args.ramp / args.clients)
+        await asyncio.gather(*tasks)
+    finally:
+        if sampler_task:
+            sampler_task.cancel()
+        if process:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log_file:
+            log_file.close()
+
+    clients = [s.get_results() for s in stats]
+    all_latency = [v for s in stats for v in s.frame_latency]
+    all_rtt = [v for s in stats for v in s.command_rtt]
+    fps = [c["fps"] for c in clients]
+    return {
+        "build": args.label or get_build_id(),
+        "timestamp": int(time.time()),
+        "config": {
+            "clients": args.clients,
+            "duration": args.duration,
+            "binary": args.binary,
+            "move_hz": args.move_hz,
+            "url": url,
+        },
+        "summary": {
+            "fps_per_client": summarize(fps),
+            "frame_latency_ms": summarize(all_latency, 1000),
+            "command_rtt_ms": summarize(all_rtt, 1000),
+            "failed_clients": sum(1 for c in clients if c["error"]),
+            "server": sampler.get_results() if sampler else None,
+        },
+        "clients": clients,
+    }
+
+
+def main():
+    """Função principal do gerador de carga."""
+    parser = argparse.ArgumentParser(description="Teste de carga e soak do servidor WebSocket do drone.")
+    parser.add_argument("--clients", "-n", help="Número de clientes simultâneos", type=int, default=10)
+    parser.add_argument("--duration", "-d", help="Duração da rodada em segundos", type=float, default=30)
+    parser.add_argument("--ramp", help="Tempo (s) para conectar todos os clientes", type=float, default=2)
+    parser.add_argument("--move-hz", help="Taxa de comandos move por cliente (0 desativa)", type=float, default=5)
+    parser.add_argument("--binary", help="Usar transporte binário de frames", action="store_true")
+    parser.add_argument("--port", help="Porta do servidor iniciado localmente", type=int, default=8765)
+    parser.add_argument("--url", help="Usar um servidor já em execução em vez de iniciar um")
+    parser.add_argument("--pid", help="PID do servidor externo para medir CPU/RSS", type=int)
+    parser.add_argument("--startup-timeout", help="Tempo máximo (s) para o servidor subir", type=float, default=30)
+    parser.add_argument("--server-log", help="Arquivo de log do servidor iniciado", default="loadtest_server.log")
+    parser.add_argument("--label", help="Identificador da build nos resultados (padrão: commit git)")
+    parser.add_argument("--output", "-o", help="Arquivo JSON de resultados", default="loadtest_results.json")
+
+    args = parser.parse_args()
+    result = asyncio.run(run_load_test(args))
+
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    summary = result["summary"]
+    print(f"Clientes: {args.clients}  Duração: {args.duration}s  Binário: {args.binary}")
+    print(f"FPS por cliente: {summary['fps_per_client']}")
+    print(f"Latência captura→cliente (ms): {summary['frame_latency_ms']}")
+    print(f"RTT de comando (ms): {summary['command_rtt_ms']}")
+    if summary["server"]:
+        print(f"Servidor: {summary['server']}")
+    print(f"Resultados salvos em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
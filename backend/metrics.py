@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger("metrics")
+
+# Limites padrão dos histogramas de latência, em segundos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(labels):
+    """Formata um dicionário de labels no formato do Prometheus."""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    """Formata um valor numérico no formato do Prometheus."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        """Inicializa o contador."""
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Incrementa o contador."""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def collect(self):
+        """Retorna as linhas de amostra do contador."""
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(dict(key))} {_format_value(value)}" for key, value in items]
+
+
+class Gauge:
+    """Medidor de valor instantâneo; pode ser calculado na coleta por uma função."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        """Inicializa o medidor."""
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, **labels):
+        """Define o valor do medidor."""
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def set_function(self, function):
+        """Define a função chamada na coleta; ela retorna um número ou um dict {labels: valor}."""
+        self.function = function
+
+    def collect(self):
+        """Retorna as linhas de amostra do medidor."""
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.error(f"Erro ao coletar {self.name}: {str(e)}")
+                return []
+            if isinstance(value, dict):
+                return [f"{self.name}{_format_labels(dict(key))} {_format_value(v)}"
+                        for key, v in value.items()]
+            return [f"{self.name} {_format_value(value)}"]
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(dict(key))} {_format_value(value)}" for key, value in items]
+
+
+class _HistogramTimer:
+    """Gerenciador de contexto que mede a duração de um bloco."""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram:
+    """Histograma de latências com limites fixos."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """Inicializa o histograma."""
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Registra uma observação."""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def time(self, **labels):
+        """Retorna um gerenciador de contexto que observa a duração do bloco."""
+        return _HistogramTimer(self, labels)
+
+    def collect(self):
+        """Retorna as linhas de amostra do histograma (buckets cumulativos, soma e contagem)."""
+        with self.lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self.series.items()]
+        lines = []
+        for key, counts, count, total in items:
+            labels = dict(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro central de métricas do pipeline, exportado no formato texto do Prometheus."""
+
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        """Retorna (criando se necessário) um contador."""
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text, function=None):
+        """Retorna (criando se necessário) um medidor."""
+        gauge = self._get_or_create(Gauge, name, help_text)
+        if function is not None:
+            gauge.set_function(function)
+        return gauge
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """Retorna (criando se necessário) um histograma."""
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """Gera o texto de exposição do Prometheus com todas as métricas."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Registro compartilhado por todo o backend
+REGISTRY = MetricsRegistry()
+
+
+async def _handle_http(reader, writer):
+    """Atende uma requisição HTTP simples: GET /metrics."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Descartar cabeçalhos da requisição
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if not line or line in (b"\r\n", b"\n"):
+                break
+
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status = "200 OK"
+            body = REGISTRY.render().encode("utf-8")
+        else:
+            status = "404 Not Found"
+            body = b"Not Found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.error(f"Erro ao atender requisição de métricas: {str(e)}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host, port):
+    """Inicia o endpoint HTTP de métricas no event loop atual."""
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info(f"Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+# Sprites mantidos por cache (textos estáticos ou que mudam pouco: fonte, modo da IA)
+SPRITE_CACHE_SIZE = 32
+
+
+class TextSprite:
+    """Texto pré-renderizado como máscara alfa, composto no frame por mistura no lugar.
+
+    O cv2.putText desenha com antialiasing; o sprite guarda a mesma máscara
+    (255 - alfa) e a cor já multiplicada pelo alfa, então compor é uma
+    multiplicação e uma soma na região do texto (resultado igual ao putText,
+    a menos de arredondamento), sem rasterizar os glifos de novo.
+    """
+
+    def __init__(self, text, scale, color, thickness):
+        """Rasteriza o texto uma vez, com a origem do putText em (left, top) dentro do sprite."""
+        (width, height), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+        pad = thickness + 1
+        self.left = pad
+        self.top = height + pad
+        alpha = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(alpha, text, (self.left, self.top), FONT, scale, 255, thickness)
+        alpha = cv2.merge([alpha, alpha, alpha])
+        self.inverse = 255 - alpha
+        self.premultiplied = cv2.multiply(np.full(alpha.shape, color, dtype=np.uint8), alpha, scale=1 / 255)
+        self.scratch = np.empty_like(alpha)
+
+    def draw(self, frame, org):
+        """Compõe o texto no frame com a origem do putText em org; retorna False se não couber inteiro."""
+        x0, y0 = org[0] - self.left, org[1] - self.top
+        height, width = self.inverse.shape[:2]
+        if x0 < 0 or y0 < 0 or x0 + width > frame.shape[1] or y0 + height > frame.shape[0]:
+            return False
+        region = frame[y0:y0 + height, x0:x0 + width]
+        cv2.multiply(region, self.inverse, dst=self.scratch, scale=1 / 255)
+        cv2.add(self.scratch, self.premultiplied, dst=region)
+        return True
+
+
+class SpriteCache:
+    """Cache LRU de sprites de texto de um único dono (uma thread: os sprites têm buffer próprio)."""
+
+    def __init__(self, max_entries=SPRITE_CACHE_SIZE):
+        """Inicializa o cache vazio."""
+        self.max_entries = max_entries
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def draw_text(self, frame, text, org, scale=0.5, color=(0, 255, 0), thickness=1):
+        """Desenha o texto no frame (no lugar) pelo sprite em cache, renderizando-o só na primeira vez.
+
+        Textos que não cabem inteiros no frame são desenhados direto com cv2.putText.
+        """
+        key = (text, scale, color, thickness)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+            sprite = self.sprites[key] = TextSprite(text, scale, color, thickness)
+            if len(self.sprites) > self.max_entries:
+                self.sprites.popitem(last=False)
+        else:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+        if not sprite.draw(frame, org):
+            cv2.putText(frame, text, org, FONT, scale, color, thickness)
+        return frame
+
+    def get_stats(self):
+        """Retorna o tamanho e a taxa de acerto do cache."""
+        lookups = self.hits + self.misses
+        return {
+            "sprites": len(self.sprites),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
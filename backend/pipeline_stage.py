@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+import time
+from metrics import REGISTRY
+
+logger = logging.getLogger("pipeline-stage")
+
+STAGE_SECONDS = REGISTRY.histogram("drone_pipeline_stage_seconds", "Tempo de processamento de um frame por estágio do pipeline de vídeo")
+
+# Frames aguardando em cada fila entre estágios
+STAGE_QUEUE_SIZE = 2
+
+
+class PipelineStage:
+    """Estágio do pipeline de vídeo: uma thread própria que consome uma fila limitada.
+
+    Cada item é (sequência, frame). process(sequence, frame) retorna o frame para
+    o próximo estágio, ou None para não repassar. Com uma thread por estágio e filas
+    FIFO a ordem das sequências é mantida; quando a fila de um estágio enche, quem
+    entrega espera (contrapressão), e a vazão do pipeline fica limitada pelo estágio
+    mais lento, não pela soma dos estágios.
+    """
+
+    def __init__(self, name, process, next_stage=None, queue_size=STAGE_QUEUE_SIZE):
+        """Inicializa o estágio (a thread começa em start())."""
+        self.name = name
+        self.process = process
+        self.next_stage = next_stage
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.last_sequence = 0
+        self.processed = 0
+        self.out_of_order = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.last_seconds = 0.0
+        self.started_at = None
+
+    def start(self):
+        """Inicia a thread do estágio."""
+        self.running = True
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True).start()
+
+    def stop(self):
+        """Sinaliza a thread para terminar (ela sai no próximo tempo limite da fila)."""
+        self.running = False
+
+    def wait_for_room(self, timeout):
+        """Espera até a fila aceitar um item; retorna False no tempo limite.
+
+        Quem entrega pode então pegar o frame mais novo disponível, em vez de um
+        frame que ficaria parado esperando a fila esvaziar.
+        """
+        with self.queue.not_full:
+            return self.queue.not_full.wait_for(lambda: len(self.queue.queue) < self.queue.maxsize, timeout)
+
+    def put(self, sequence, frame, timeout=0.5):
+        """Entrega um frame ao estágio, esperando enquanto a fila estiver cheia; retorna False se parado."""
+        while self.running:
+            try:
+                self.queue.put((sequence, frame), timeout=timeout)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        """Loop do estágio: processa os frames na ordem e repassa ao próximo."""
+        while self.running:
+            try:
+                sequence, frame = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if sequence <= self.last_sequence:
+                # Nunca deveria acontecer com filas FIFO; descartar em vez de publicar fora de ordem
+                self.out_of_order += 1
+                continue
+            self.last_sequence = sequence
+
+            start_time = time.monotonic()
+            try:
+                frame = self.process(sequence, frame)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Erro no estágio {self.name}: {str(e)}")
+                continue
+            finally:
+                elapsed = time.monotonic() - start_time
+                self.busy_seconds += elapsed
+                self.last_seconds = elapsed
+                STAGE_SECONDS.observe(elapsed, stage=self.name)
+            self.processed += 1
+
+            if frame is not None and self.next_stage is not None:
+                self.next_stage.put(sequence, frame)
+
+    def get_stats(self):
+        """Retorna o tempo por frame, a ocupação (fração do tempo processando) e a fila do estágio."""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            "processed": self.processed,
+            "last_sequence": self.last_sequence,
+            "avg_ms": round(1000 * self.busy_seconds / self.processed, 2) if self.processed else None,
+            "last_ms": round(1000 * self.last_seconds, 2),
+            "utilization": round(self.busy_seconds / elapsed, 3) if elapsed else None,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "out_of_order": self.out_of_order,
+            "errors": self.errors,
+        }
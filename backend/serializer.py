@@ -0,0 +1,130 @@
+import base64
+import json
+import logging
+import time
+
+logger = logging.getLogger("serializer")
+
+# Dependências opcionais: orjson acelera o JSON, msgpack habilita o codec binário
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Codecs de fio negociados na mensagem "connect"
+CODEC_JSON = "json"
+CODEC_MSGPACK = "msgpack"
+
+
+def epoch_ms():
+    """Timestamp atual em milissegundos desde a época Unix."""
+    return time.time_ns() // 1_000_000
+
+
+class RawJson:
+    """Fragmento JSON já serializado, embutido como está no envelope."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        """Inicializa o fragmento."""
+        self.text = text
+
+
+class JsonSerializer:
+    """Serializador JSON (texto), usando orjson quando instalado e json da stdlib caso contrário."""
+
+    name = CODEC_JSON
+    binary = False
+
+    def __init__(self):
+        """Inicializa o serializador e o cache de fragmentos de envelope."""
+        if orjson is not None:
+            self.backend = "orjson"
+            self._dumps = lambda obj: orjson.dumps(obj).decode('utf-8')
+        else:
+            self.backend = "json"
+            self._dumps = json.JSONEncoder(separators=(",", ":")).encode
+        self._prefixes = {}
+        self._keys = {}
+
+    def dumps(self, obj):
+        """Serializa um objeto arbitrário."""
+        return self._dumps(obj)
+
+    def frame_payload(self, encoded):
+        """Representa os bytes do frame como string base64 já serializada."""
+        return RawJson('"' + base64.b64encode(encoded).decode('ascii') + '"')
+
+    def envelope(self, kind, fields):
+        """Serializa uma mensagem {"type": kind, **fields, "timestamp": ms} a partir de fragmentos pré-montados."""
+        prefix = self._prefixes.get(kind)
+        if prefix is None:
+            prefix = self._prefixes[kind] = '{"type":' + self._dumps(kind)
+
+        parts = [prefix]
+        for key, value in fields.items():
+            key_fragment = self._keys.get(key)
+            if key_fragment is None:
+                key_fragment = self._keys[key] = ',' + self._dumps(key) + ':'
+            parts.append(key_fragment)
+            parts.append(value.text if isinstance(value, RawJson) else self._dumps(value))
+        parts.append(',"timestamp":')
+        parts.append(str(epoch_ms()))
+        parts.append('}')
+        return "".join(parts)
+
+
+class MsgpackSerializer:
+    """Serializador msgpack (mensagens binárias); bytes de frame seguem sem base64."""
+
+    name = CODEC_MSGPACK
+    binary = True
+    backend = "msgpack"
+
+    def __init__(self):
+        """Inicializa o empacotador reutilizável."""
+        self._packer = msgpack.Packer(use_bin_type=True)
+
+    def dumps(self, obj):
+        """Serializa um objeto arbitrário."""
+        return self._packer.pack(obj)
+
+    def frame_payload(self, encoded):
+        """Os bytes do frame são enviados diretamente como bin."""
+        return bytes(encoded)
+
+    def envelope(self, kind, fields):
+        """Serializa uma mensagem {"type": kind, **fields, "timestamp": ms}."""
+        message = {"type": kind}
+        message.update(fields)
+        message["timestamp"] = epoch_ms()
+        return self._packer.pack(message)
+
+
+def available_codecs():
+    """Retorna os codecs de fio disponíveis neste servidor."""
+    codecs = [CODEC_JSON]
+    if msgpack is not None:
+        codecs.append(CODEC_MSGPACK)
+    return codecs
+
+
+_serializers = {}
+
+
+def get_serializer(codec=CODEC_JSON):
+    """Retorna o serializador (compartilhado) do codec, caindo para JSON se indisponível."""
+    if codec not in available_codecs():
+        if codec != CODEC_JSON:
+            logger.warning(f"Codec {codec} indisponível, usando {CODEC_JSON}")
+        codec = CODEC_JSON
+    serializer = _serializers.get(codec)
+    if serializer is None:
+        serializer = _serializers[codec] = MsgpackSerializer() if codec == CODEC_MSGPACK else JsonSerializer()
+    return serializer
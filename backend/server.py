@@ -2,16 +2,31 @@
 import asyncio
 import json
 import logging
+import math
 import os
-import base64
+import sys
+import threading
 import time
 import cv2
 import numpy as np
 import websockets
-from datetime import datetime
 from drone_controller import DroneController
 from video_processor import VideoProcessor
 from ai_controller import AIController
+from adaptive_quality import AdaptiveQuality, QUALITY_TIERS
+from change_detector import ChangeDetector
+from detector_backends import BatchingDetector, OpenCVDNNDetector
+from command_dispatch import CommandRegistry, CommandSpec, PRIORITY_SAFETY, PRIORITY_QUERY, PRIORITY_BACKGROUND
+from executor_stage import ExecutorStage, StageBusyError
+from fleet import DronePipeline, FleetRegistry
+from frame_cache import RESOLUTION_TIERS
+from frame_protocol import EncodedFrame, TRANSPORT_JSON, TRANSPORT_BINARY
+from metrics import REGISTRY, start_metrics_server
+from session_log import ReplaySource, SessionRecorder
+from serializer import available_codecs, get_serializer, CODEC_JSON
+from telemetry_stream import TelemetryStream
+from video_recorder import VideoRecorder
+from video_sources import create_source
 
 # Configuração de logging
 logging.basicConfig(
@@ -23,204 +38,620 @@ logger = logging.getLogger("drone-backend")
 # Configurações do servidor
 HOST = os.environ.get("BACKEND_HOST", "0.0.0.0")
 PORT = int(os.environ.get("BACKEND_PORT", "8000"))
+METRICS_HOST = os.environ.get("BACKEND_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("BACKEND_METRICS_PORT", "8001"))
+# Número de processos gateway (0 = processo único; >0 = um worker de captura/IA e N gateways)
+GATEWAY_PROCESSES = int(os.environ.get("BACKEND_GATEWAYS", "0"))
 WS_PATH = os.environ.get("BACKEND_WS_PATH", "")
+# Fonte de vídeo: "auto" tenta a câmera e cai para a simulação; "simulation" força a simulação;
+# "file:<caminho>", "frames:<diretório de JPEGs>" ou uma URL de stream usam uma fonte plugável
+VIDEO_SOURCE = os.environ.get("BACKEND_VIDEO_SOURCE", "auto")
+# Velocidade das fontes plugáveis (1.0 = taxa nativa, 0 = o mais rápido possível) e repetição no fim
+SOURCE_SPEED = float(os.environ.get("BACKEND_SOURCE_SPEED", "1.0"))
+SOURCE_LOOP = os.environ.get("BACKEND_SOURCE_LOOP", "1") != "0"
+# Gravação de vídeo (comando "recording"): diretório, duração e tamanho máximos de cada segmento e fila
+RECORDING_DIR = os.environ.get("BACKEND_RECORDING_DIR", "recordings")
+RECORDING_SEGMENT_SECONDS = float(os.environ.get("BACKEND_RECORDING_SEGMENT_SECONDS", "300"))
+RECORDING_SEGMENT_MB = float(os.environ.get("BACKEND_RECORDING_SEGMENT_MB", "512"))
+RECORDING_QUEUE_SIZE = int(os.environ.get("BACKEND_RECORDING_QUEUE_SIZE", "30"))
+# Detector de objetos (OpenCV DNN na CPU) compartilhado pelos drones; sem modelo, detecção simulada
+DETECTOR_MODEL = os.environ.get("BACKEND_DETECTOR_MODEL", "")
+DETECTOR_CONFIG = os.environ.get("BACKEND_DETECTOR_CONFIG", "")
+DETECTOR_LABELS = os.environ.get("BACKEND_DETECTOR_LABELS", "")
+DETECTOR_INPUT_SIZE = int(os.environ.get("BACKEND_DETECTOR_INPUT_SIZE", "300"))
+DETECTOR_MAX_BATCH = int(os.environ.get("BACKEND_DETECTOR_MAX_BATCH", "8"))
+DETECTOR_BATCH_WAIT_MS = float(os.environ.get("BACKEND_DETECTOR_BATCH_WAIT_MS", "5"))
+DETECTOR_TIMEOUT = float(os.environ.get("BACKEND_DETECTOR_TIMEOUT", "30"))
+# Cena estática: limiar de mudança por bloco (0-255, 0 desativa, o padrão) e frames até uma atualização forçada.
+# Desligado por padrão: movimento lento (como o da simulação) some no nível reduzido e seria tratado como estático
+MOTION_THRESHOLD = float(os.environ.get("BACKEND_MOTION_THRESHOLD", "0"))
+MOTION_REFRESH_FRAMES = int(os.environ.get("BACKEND_MOTION_REFRESH_FRAMES", "30"))
+# Escala da detecção de IA em relação ao frame (0.5 e 0.25 reaproveitam níveis da pirâmide)
+AI_DETECTION_SCALE = float(os.environ.get("BACKEND_AI_DETECTION_SCALE", "0.5"))
+CLIENT_QUEUE_SIZE = int(os.environ.get("BACKEND_CLIENT_QUEUE_SIZE", "2"))
+ENCODE_WORKERS = int(os.environ.get("BACKEND_ENCODE_WORKERS", "2"))
+ANALYSIS_WORKERS = int(os.environ.get("BACKEND_ANALYSIS_WORKERS", "1"))
+STAGE_MAX_PENDING = int(os.environ.get("BACKEND_STAGE_MAX_PENDING", "4"))
+# Limites dos níveis de qualidade adaptativa (índices em QUALITY_TIERS, 0 = melhor)
+QUALITY_MIN_TIER = int(os.environ.get("BACKEND_QUALITY_MIN_TIER", "0"))
+QUALITY_MAX_TIER = int(os.environ.get("BACKEND_QUALITY_MAX_TIER", str(len(QUALITY_TIERS) - 1)))
+# Canal de telemetria separado do vídeo
+TELEMETRY_DEFAULT_HZ = float(os.environ.get("BACKEND_TELEMETRY_HZ", "10"))
+TELEMETRY_MAX_HZ = float(os.environ.get("BACKEND_TELEMETRY_MAX_HZ", "100"))
+TELEMETRY_KEYFRAME_INTERVAL = float(os.environ.get("BACKEND_TELEMETRY_KEYFRAME_INTERVAL", "2.0"))
+# Taxa do loop de controle de movimento (0 envia cada move diretamente ao drone)
+CONTROL_LOOP_HZ = float(os.environ.get("BACKEND_CONTROL_LOOP_HZ", "20"))
+# Gravação da sessão em log indexado e reprodução de um log no lugar da câmera
+SESSION_LOG = os.environ.get("BACKEND_SESSION_LOG", "")
+REPLAY_LOG = os.environ.get("BACKEND_REPLAY", "")
+REPLAY_SPEED = float(os.environ.get("BACKEND_REPLAY_SPEED", "1.0"))
+REPLAY_LOOP = os.environ.get("BACKEND_REPLAY_LOOP", "1") != "0"
+# Frota: ids dos drones servidos (o primeiro usa a câmera local) e drones simulados extras
+DRONE_IDS = [drone_id.strip() for drone_id in os.environ.get("BACKEND_DRONES", "default").split(",") if drone_id.strip()]
+SIMULATED_DRONES = int(os.environ.get("BACKEND_SIMULATED_DRONES", "0"))
+# Tempos limite da inicialização (em segundos); a câmera cai para a simulação ao esgotar
+INIT_TIMEOUT = float(os.environ.get("BACKEND_INIT_TIMEOUT", "10"))
+CAMERA_TIMEOUT = float(os.environ.get("BACKEND_CAMERA_TIMEOUT", "5"))
 
 # Armazenamento de conexões ativas
 connected_clients = set()
 
-# Controlador do drone
-drone_controller = DroneController()
+# Gravador da sessão (ativo quando BACKEND_SESSION_LOG está definido)
+session_recorder = None
 
-# Controlador de IA
-ai_controller = AIController()
+# Estágios de execução para trabalho bloqueante do OpenCV
+encode_stage = ExecutorStage("encode", max_workers=ENCODE_WORKERS, max_pending=STAGE_MAX_PENDING)
+analysis_stage = ExecutorStage("analysis", max_workers=ANALYSIS_WORKERS, max_pending=STAGE_MAX_PENDING)
+# Escrita do log de sessão: uma única thread mantém a ordem dos registros
+session_stage = ExecutorStage("session", max_workers=1, max_pending=STAGE_MAX_PENDING)
 
-# Processador de vídeo
-video_processor = VideoProcessor()
+# Métricas do servidor
+ENCODE_SECONDS = REGISTRY.histogram("drone_encode_seconds", "Tempo de codificação JPEG por nível de qualidade")
+CLIENT_SEND_SECONDS = REGISTRY.histogram("drone_client_send_seconds", "Latência de envio de frames aos clientes")
+FRAMES_SKIPPED = REGISTRY.counter("drone_frames_skipped_total", "Ticks do produtor pulados")
+COMMANDS_TOTAL = REGISTRY.counter("drone_commands_total", "Comandos processados")
+REGISTRY.gauge("drone_connected_clients", "Clientes WebSocket conectados", lambda: len(connected_clients))
+REGISTRY.gauge("drone_client_queue_depth", "Frames aguardando envio nas filas dos clientes",
+               lambda: {(("drone", drone.drone_id),): sum(s.queue.qsize() for s in drone.frame_hub.subscribers)
+                        for drone in fleet})
+REGISTRY.gauge("drone_client_frames_dropped", "Frames descartados nas filas dos clientes (drop-oldest)",
+               lambda: {(("drone", drone.drone_id),): drone.frame_hub.get_stats()["dropped"] for drone in fleet})
+REGISTRY.gauge("drone_stage_queue_depth", "Tarefas pendentes nos estágios de execução",
+               lambda: {(("stage", stage.name),): stage.queue_depth()
+                        for stage in (encode_stage, analysis_stage, session_stage)})
 
-async def send_telemetry_data(websocket):
-    """Envia dados de telemetria periodicamente para o cliente."""
-    try:
-        while True:
-            if websocket in connected_clients:
-                # Obter dados de telemetria do drone
-                telemetry = drone_controller.get_telemetry()
-                
-                # Obter status da IA
-                ai_status = ai_controller.get_ai_status()
-                
-                # Obter frame de vídeo processado
+def encode_jpeg(pyramid, tier):
+    """Codifica o frame em JPEG no nível indicado (executado no estágio de codificação).
+    
+    A resolução vem da pirâmide do frame, compartilhada por todos os níveis.
+    """
+    with ENCODE_SECONDS.time(tier=tier["name"]):
+        scale = tier.get("scale", 1.0)
+        if "max_width" in tier:
+            # Miniaturas têm largura fixa, independente da resolução da fonte
+            scale = min(1.0, tier["max_width"] / pyramid.width)
+        frame = pyramid.scaled(scale)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, tier["quality"]])
+    height, width = frame.shape[:2]
+    return EncodedFrame(buffer, width, height)
+
+# Registro de comandos, compartilhado por todos os drones
+command_registry = CommandRegistry()
+
+# Frota de drones, cada um com seu pipeline de captura, IA, telemetria e comandos
+fleet = FleetRegistry()
+
+def create_drone(drone_id):
+    """Cria e registra o pipeline de um drone com controladores próprios."""
+    ai_controller = AIController()
+    ai_controller.detection_scale = AI_DETECTION_SCALE
+    video_processor = VideoProcessor()
+    video_processor.change_detector = ChangeDetector(MOTION_THRESHOLD, MOTION_REFRESH_FRAMES)
+    return fleet.add(DronePipeline(
+        drone_id, len(fleet), DroneController(), ai_controller, video_processor,
+        command_registry, encode_jpeg, encode_stage,
+        queue_size=CLIENT_QUEUE_SIZE,
+        control_loop_hz=CONTROL_LOOP_HZ,
+        telemetry_interval=1 / TELEMETRY_MAX_HZ,
+    ))
+
+for drone_id in DRONE_IDS:
+    create_drone(drone_id)
+for number in range(1, SIMULATED_DRONES + 1):
+    create_drone(f"sim-{number:02d}")
+
+REGISTRY.gauge("drone_command_queue_depth", "Comandos aguardando despacho",
+               lambda: {(("drone", drone.drone_id),): drone.command_scheduler.queue_depth() for drone in fleet})
+REGISTRY.gauge("drone_pipeline_queue_depth", "Frames aguardando nas filas dos estágios do pipeline de vídeo",
+               lambda: {(("drone", drone.drone_id), ("stage", stage.name)): stage.queue.qsize()
+                        for drone in fleet for stage in drone.video_processor.stages})
+
+def start_video_recording(drone):
+    """Inicia o gravador de vídeo do drone, alimentado pelos frames publicados."""
+    if drone.video_recorder is None:
+        drone.video_recorder = VideoRecorder(
+            RECORDING_DIR, drone.drone_id, fps=drone.fps,
+            segment_seconds=RECORDING_SEGMENT_SECONDS,
+            segment_bytes=int(RECORDING_SEGMENT_MB * 1024 * 1024),
+            queue_size=RECORDING_QUEUE_SIZE,
+        )
+    if drone.video_recorder.start():
+        drone.recorder_feed = asyncio.create_task(feed_video_recorder(drone.video_recorder, drone))
+
+async def stop_video_recording(drone):
+    """Encerra o gravador de vídeo do drone (o fechamento do segmento roda fora do event loop)."""
+    if drone.video_recorder:
+        await asyncio.to_thread(drone.video_recorder.stop)
+
+async def feed_video_recorder(recorder, drone):
+    """Entrega ao gravador cada novo frame do drone com a telemetria do momento (sem bloquear)."""
+    last_sequence = 0
+    while recorder.is_recording:
+        try:
+            video_processor = drone.video_processor
+            latest = await video_processor.frames.wait_async(last_sequence, timeout=1.0)
+            if latest is None:
+                continue
+            last_sequence, frame = latest
+            if frame is None:
                 frame = video_processor.get_frame()
-                
-                # Converter frame para base64
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                
-                # Criar mensagem com telemetria e frame
-                message = {
-                    "type": "frame",
-                    "frame": frame_base64,
-                    "state": {
-                        "bateria": telemetry["battery"],
-                        "altura": telemetry["altitude"],
-                        "temperatura": telemetry["temperature"],
-                        "atitude": {
-                            "pitch": telemetry["attitude"]["pitch"],
-                            "roll": telemetry["attitude"]["roll"],
-                            "yaw": telemetry["attitude"]["yaw"],
-                        },
-                        "is_flying": telemetry["is_flying"],
-                        "is_recording": telemetry["is_recording"],
-                    },
-                    "ai": {
-                        "enabled": ai_status["enabled"],
-                        "mode": ai_status["mode"],
-                        "detected_objects": ai_status["detected_objects"],
-                    },
-                    "mode": drone_controller.current_mode,
-                    "timestamp": datetime.now().isoformat(),
-                }
-                
-                # Enviar mensagem para o cliente
-                await websocket.send(json.dumps(message))
-                
-                # Aguardar antes de enviar o próximo frame (30 FPS)
-                await asyncio.sleep(1/30)
+            recorder.submit(frame, drone.build_telemetry_snapshot())
+        except Exception as e:
+            logger.error(f"Erro ao alimentar o gravador de vídeo: {str(e)}")
+            await asyncio.sleep(1/60)
+
+async def record_session(recorder, drone):
+    """Grava cada novo frame do drone (JPEG do nível completo, via cache), a telemetria e as detecções."""
+    last_sequence = 0
+    while True:
+        try:
+            video_processor = drone.video_processor
+            latest = await video_processor.frames.wait_async(last_sequence, timeout=1.0)
+            if latest is None:
+                continue
+            last_sequence, frame = latest
+            encoded = await drone.frame_cache.get(last_sequence, "full", frame, video_processor.get_frame)
+            # Escrita em disco fora do event loop
+            await session_stage.run(recorder.record_tick, encoded.data, drone.build_telemetry_snapshot(),
+                                    list(getattr(drone.ai_controller, "detected_objects", [])))
+        except StageBusyError:
+            FRAMES_SKIPPED.inc(reason="recorder_busy")
+        except Exception as e:
+            logger.error(f"Erro ao gravar sessão: {str(e)}")
+            await asyncio.sleep(1/60)
+
+def get_send_backlog(websocket):
+    """Retorna o número de bytes aguardando envio no buffer do socket."""
+    transport = getattr(websocket, "transport", None)
+    if transport is None:
+        return 0
+    return transport.get_write_buffer_size()
+
+async def send_video_frames(websocket, subscription, drone):
+    """Envia ao cliente os pacotes de frame publicados pelo hub do drone."""
+    try:
+        quality = subscription.quality
+        while websocket in connected_clients:
+            packet = await subscription.get()
+            
+            # Respeitar o FPS alvo do nível atual do cliente; a reprodução na velocidade 0
+            # ("o mais rápido possível") não tem limite de FPS, só a contrapressão do socket
+            tier = subscription.tier_name()
+            replay_source = drone.replay_source
+            unpaced = replay_source is not None and replay_source.speed == 0
+            if tier not in packet.encodings or not (unpaced or quality.should_send()):
+                continue
+            
+            # Enviar no formato negociado pelo cliente, medindo a latência de envio
+            if subscription.transport == TRANSPORT_BINARY:
+                message = packet.binary_frame(tier)
             else:
-                # Cliente desconectado, encerrar loop
-                break
+                message = packet.frame_message(subscription.serializer, tier)
+            start_time = time.perf_counter()
+            await websocket.send(message)
+            send_latency = time.perf_counter() - start_time
+            CLIENT_SEND_SECONDS.observe(send_latency, transport=subscription.transport)
+            quality.record_send(send_latency, get_send_backlog(websocket))
     except websockets.exceptions.ConnectionClosed:
-        logger.info("Conexão fechada durante envio de telemetria")
+        logger.info("Conexão fechada durante envio de vídeo")
     except Exception as e:
-        logger.error(f"Erro ao enviar telemetria: {str(e)}")
+        logger.error(f"Erro ao enviar vídeo: {str(e)}")
 
-async def handle_command(websocket, command_data):
-    """Processa comandos recebidos do cliente."""
+async def send_telemetry_stream(websocket, stream, serializer, drone):
+    """Envia a telemetria de um drone na taxa própria do canal, apenas com os campos alterados."""
     try:
-        command = command_data.get("command")
-        params = command_data.get("params", {})
-        
-        logger.info(f"Comando recebido: {command} com parâmetros: {params}")
-        
-        result = None
-        
-        if command == "takeoff":
-            result = drone_controller.takeoff()
-        elif command == "land":
-            result = drone_controller.land()
-        elif command == "move":
-            # Extrair parâmetros de movimento
-            left_right = params.get("left_right", 0)
-            forward_backward = params.get("forward_backward", 0)
-            up_down = params.get("up_down", 0)
-            yaw = params.get("yaw", 0)
-            
-            result = drone_controller.move(left_right, forward_backward, up_down, yaw)
-        elif command == "set_mode":
-            mode = params.get("mode", "manual")
-            result = drone_controller.set_mode(mode)
+        next_deadline = time.monotonic()
+        while websocket in connected_clients:
+            message = stream.next_message(drone.telemetry_sampler.sample())
+            if message is not None:
+                message["drone_id"] = drone.drone_id
+                await websocket.send(serializer.envelope("telemetry", message))
             
-            # Configurar modo de IA correspondente
-            if mode == "face_tracking":
-                ai_controller.set_ai_mode("face_tracking")
-            elif mode == "slam":
-                ai_controller.set_ai_mode("exploration")
-            elif mode == "path_planning":
-                ai_controller.set_ai_mode("autonomous")
-            elif mode == "neural":
-                ai_controller.set_ai_mode("object_detection")
-            else:
-                ai_controller.set_ai_mode("idle")
-                
-        elif command == "recording":
-            action = params.get("action")
-            if action == "start":
-                result = drone_controller.start_recording()
-            elif action == "stop":
-                result = drone_controller.stop_recording()
-        elif command == "get_info":
-            result = {
-                "drone_info": drone_controller.get_info(),
-                "backend_info": {
-                    "version": "1.0.0",
-                    "uptime": time.time() - drone_controller.start_time,
-                    "video_source": video_processor.video_source,
-                },
-                "ai_info": ai_controller.get_ai_status()
-            }
-        elif command == "ai_command":
-            # Processar comandos específicos de IA
-            ai_mode = params.get("mode")
-            if ai_mode:
-                result = {"success": ai_controller.set_ai_mode(ai_mode)}
-            else:
-                result = {"success": False, "message": "Modo de IA não especificado"}
-        elif command == "voice_command":
-            # Processar comandos de voz
-            voice_text = params.get("text", "")
-            if voice_text:
-                command_result = ai_controller.process_voice_command(voice_text)
-                result = {"success": True, "command": command_result}
-                
-                # Executar o comando reconhecido automaticamente
-                if command_result["action"] != "unknown" and command_result["confidence"] > 0.7:
-                    # Implementar ações baseadas no comando reconhecido
-                    action = command_result["action"]
-                    if action == "takeoff":
-                        drone_controller.takeoff()
-                    elif action == "land":
-                        drone_controller.land()
-                    elif action == "move_up":
-                        drone_controller.move(0, 0, 50, 0)
-                    elif action == "move_down":
-                        drone_controller.move(0, 0, -50, 0)
-                    # ... outros comandos
-            else:
-                result = {"success": False, "message": "Texto do comando de voz não fornecido"}
-        elif command == "analyze_scene":
-            # Analisar a cena atual
-            frame = video_processor.get_frame()
-            scene_analysis = ai_controller.analyze_scene(frame)
-            result = {"success": True, "analysis": scene_analysis}
+            # Pacing por deadline para manter a taxa configurada
+            next_deadline += stream.interval
+            delay = next_deadline - time.monotonic()
+            if delay < 0:
+                next_deadline = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+    except websockets.exceptions.ConnectionClosed:
+        logger.info("Conexão fechada durante envio de telemetria")
+    except Exception as e:
+        logger.error(f"Erro ao enviar telemetria: {str(e)}")
+
+# Modos de IA correspondentes a cada modo de voo
+AI_MODE_BY_FLIGHT_MODE = {
+    "face_tracking": "face_tracking",
+    "slam": "exploration",
+    "path_planning": "autonomous",
+    "neural": "object_detection",
+}
+
+@command_registry.register("land", priority=PRIORITY_SAFETY)
+async def command_land(drone, params, client_id):
+    if drone.control_loop:
+        drone.control_loop.clear()
+    return await drone.call(drone.drone_controller.land)
+
+@command_registry.register("stop", priority=PRIORITY_SAFETY)
+async def command_stop(drone, params, client_id):
+    # Parar no lugar: descartar o setpoint pendente e zerar todos os eixos de movimento
+    if drone.control_loop:
+        drone.control_loop.clear()
+    return await drone.call(drone.drone_controller.move, 0, 0, 0, 0)
+
+@command_registry.register("takeoff", flight_control=True)
+async def command_takeoff(drone, params, client_id):
+    return await drone.call(drone.drone_controller.takeoff)
+
+@command_registry.register("move", preemptible=True, flight_control=True)
+async def command_move(drone, params, client_id):
+    # Extrair parâmetros de movimento
+    left_right = params.get("left_right", 0)
+    forward_backward = params.get("forward_backward", 0)
+    up_down = params.get("up_down", 0)
+    yaw = params.get("yaw", 0)
+    
+    # No modo de loop de controle o setpoint é enviado no próximo tick
+    if drone.control_loop:
+        drone.control_loop.submit(left_right, forward_backward, up_down, yaw)
+        return {"success": True, "queued": True}
+    return await drone.call(drone.drone_controller.move, left_right, forward_backward, up_down, yaw)
+
+@command_registry.register("set_mode", flight_control=True)
+async def command_set_mode(drone, params, client_id):
+    mode = params.get("mode", "manual")
+    result = await drone.call(drone.drone_controller.set_mode, mode)
+    
+    # Configurar modo de IA correspondente
+    await drone.call(drone.ai_controller.set_ai_mode, AI_MODE_BY_FLIGHT_MODE.get(mode, "idle"))
+    return result
+
+@command_registry.register("recording", background=True)
+async def command_recording(drone, params, client_id):
+    action = params.get("action")
+    if action == "start":
+        result = await drone.call(drone.drone_controller.start_recording)
+        start_video_recording(drone)
+        return result
+    elif action == "stop":
+        result = await drone.call(drone.drone_controller.stop_recording)
+        await stop_video_recording(drone)
+        return result
+    return None
+
+@command_registry.register("get_info", priority=PRIORITY_QUERY)
+async def command_get_info(drone, params, client_id):
+    drone_info = await drone.call(drone.drone_controller.get_info)
+    start_time = await drone.call(lambda: drone.drone_controller.start_time)
+    ai_info = await drone.call(drone.ai_controller.get_ai_status)
+    return {
+        "drone_info": drone_info,
+        "backend_info": {
+            "version": "1.0.0",
+            "uptime": time.time() - start_time,
+            "drone_id": drone.drone_id,
+            "video_source": drone.video_processor.video_source,
+            "clients": drone.frame_hub.get_client_stats(),
+            "frame_cache": drone.frame_cache.get_stats(),
+            "executor_stages": {
+                "encode": encode_stage.get_stats(),
+                "analysis": analysis_stage.get_stats(),
+                "session": session_stage.get_stats(),
+            },
+            "commands": drone.command_scheduler.get_stats(),
+            "control_loop": drone.control_loop.get_stats() if drone.control_loop else None,
+            "session_recorder": session_recorder.get_stats() if session_recorder else None,
+            "replay": drone.replay_source.get_stats() if drone.replay_source else None,
+            "recording": drone.video_recorder.get_stats() if drone.video_recorder else None,
+            "readiness": drone.readiness.get_status(),
+            "fleet": fleet.describe(),
+        },
+        "ai_info": ai_info
+    }
+
+@command_registry.register("fleet_status", priority=PRIORITY_QUERY)
+async def command_fleet_status(drone, params, client_id):
+    # Estado dos pipelines de todos os drones
+    return fleet.get_stats()
+
+@command_registry.register("ai_command")
+async def command_ai(drone, params, client_id):
+    # Processar comandos específicos de IA
+    ai_mode = params.get("mode")
+    if ai_mode:
+        return {"success": await drone.call(drone.ai_controller.set_ai_mode, ai_mode)}
+    return {"success": False, "message": "Modo de IA não especificado"}
+
+# Confiança mínima para executar um comando de voz reconhecido
+VOICE_MIN_CONFIDENCE = 0.7
+# Ações de voz de segurança e o comando que as executa (mesma prioridade e preempção)
+VOICE_SAFETY_COMMANDS = {"land": "land", "stop": "stop"}
+
+async def resolve_voice_command(drone, spec, params):
+    """Reconhece o comando de voz na entrada e retorna o CommandSpec que o executa, ou None.
+    
+    O comando reconhecido como land ou stop é enfileirado como o próprio comando de
+    segurança: passa à frente da fila, descarta os comandos de voo pendentes e limpa
+    o loop de controle. Os demais mantêm a prioridade do voice_command. Em ambos os
+    casos o handler recebe o resultado já reconhecido, sem reconhecer de novo.
+    """
+    voice_text = params.get("text", "")
+    if not voice_text:
+        return None
+    command_result = await drone.call(drone.ai_controller.process_voice_command, voice_text)
+    
+    safety_command = VOICE_SAFETY_COMMANDS.get(command_result["action"])
+    if safety_command is not None and command_result["confidence"] > VOICE_MIN_CONFIDENCE:
+        spec = command_registry.get(safety_command)
+    
+    async def handler(drone, params, client_id):
+        return await execute_voice_command(drone, command_result, client_id)
+    return CommandSpec("voice_command", handler, spec.priority, spec.background, spec.preemptible,
+                       spec.flight_control)
+
+async def execute_voice_command(drone, command_result, client_id):
+    """Executa um comando de voz reconhecido; land e stop usam os handlers de segurança."""
+    # Executar o comando reconhecido automaticamente
+    if command_result["action"] != "unknown" and command_result["confidence"] > VOICE_MIN_CONFIDENCE:
+        # Implementar ações baseadas no comando reconhecido
+        action = command_result["action"]
+        drone_controller = drone.drone_controller
+        if action == "takeoff":
+            await drone.call(drone_controller.takeoff)
+        elif action in VOICE_SAFETY_COMMANDS:
+            # O resultado do land/stop é o da resposta (uma falha no pouso não vira sucesso)
+            result = await command_registry.get(VOICE_SAFETY_COMMANDS[action]).handler(drone, {}, client_id)
+            if isinstance(result, dict):
+                return {**result, "command": command_result}
+            return {"success": result, "command": command_result}
+        elif action == "move_up":
+            await drone.call(drone_controller.move, 0, 0, 50, 0)
+        elif action == "move_down":
+            await drone.call(drone_controller.move, 0, 0, -50, 0)
+        # ... outros comandos
+    return {"success": True, "command": command_result}
+
+@command_registry.register("voice_command", flight_control=True)
+async def command_voice(drone, params, client_id):
+    # Processar comandos de voz (normalmente já reconhecidos na entrada, por resolve_voice_command)
+    voice_text = params.get("text", "")
+    if not voice_text:
+        return {"success": False, "message": "Texto do comando de voz não fornecido"}
+    
+    command_result = await drone.call(drone.ai_controller.process_voice_command, voice_text)
+    return await execute_voice_command(drone, command_result, client_id)
+
+@command_registry.register("analyze_scene", priority=PRIORITY_BACKGROUND, background=True, preemptible=True)
+async def command_analyze_scene(drone, params, client_id):
+    # Analisar a cena atual fora do event loop
+    frame = drone.video_processor.get_frame()
+    scene_analysis = await analysis_stage.run(drone.ai_controller.analyze_scene, frame, owner=client_id)
+    return {"success": True, "analysis": scene_analysis}
+
+@command_registry.register("replay", priority=PRIORITY_QUERY)
+async def command_replay(drone, params, client_id):
+    # Controle da reprodução de uma sessão gravada
+    replay_source = drone.replay_source
+    if not replay_source:
+        raise ValueError(f"Drone {drone.drone_id} não está reproduzindo uma sessão")
+    action = params.get("action", "status")
+    if action == "seek":
+        replay_source.seek(params.get("position", 0))
+    elif action == "speed":
+        replay_source.set_speed(params.get("speed", 1.0))
+    elif action == "pause":
+        replay_source.set_paused(True)
+    elif action == "resume":
+        replay_source.set_paused(False)
+    elif action != "status":
+        raise ValueError(f"Ação de reprodução desconhecida: {action}")
+    return replay_source.get_stats()
+
+async def handle_command(websocket, command_data, serializer, default_drone):
+    """Enfileira um comando recebido do cliente no agendador do drone indicado (ou no drone padrão do cliente)."""
+    command = command_data.get("command")
+    params = command_data.get("params", {})
+    drone_id = command_data.get("drone_id", default_drone.drone_id)
+    
+    logger.debug("Comando recebido: %s com parâmetros: %s (drone %s)", command, params, drone_id)
+    
+    if session_recorder:
+        # Gravado na thread do log (sem esperar): a escrita não atrasa o comando
+        session_stage.executor.submit(session_recorder.record_command, id(websocket), command, params)
+    
+    async def reply(result, error):
+        COMMANDS_TOTAL.inc(command=str(command), status="error" if error is not None else "ok")
+        if error is not None:
+            logger.error(f"Erro ao processar comando {command}: {str(error)}")
+            # Enviar erro ao cliente
+            response = serializer.envelope("error", {
+                "error": str(error),
+                "command": command or "unknown",
+                "drone_id": drone_id,
+            })
+        else:
+            # Enviar resposta ao cliente
+            response = serializer.envelope("command_result", {
+                "command": command,
+                "result": result,
+                "drone_id": drone_id,
+            })
+        await websocket.send(response)
+    
+    drone = fleet.get(drone_id)
+    if drone is None:
+        await reply(None, ValueError(f"Drone desconhecido: {drone_id}"))
+        return
+    
+    spec = command_registry.get(command)
+    if spec is None:
+        # Comandos desconhecidos mantêm a resposta vazia de antes
+        await reply(None, None)
+        return
+    
+    # Consultas respondem durante a inicialização; comandos de voo esperam o drone ficar pronto
+    if spec.priority != PRIORITY_QUERY and not drone.readiness.is_ready("drone"):
+        await reply(None, RuntimeError(f"Drone {drone.drone_id} ainda não está pronto"))
+        return
+    
+    # Comandos de voz são reconhecidos uma vez, na entrada; os de segurança seguem o caminho do land/stop
+    if command == "voice_command":
+        try:
+            spec = await resolve_voice_command(drone, spec, params) or spec
+        except Exception as e:
+            await reply(None, e)
+            return
+    
+    drone.command_scheduler.submit(spec, params, id(websocket), reply)
+
+class ClientSession:
+    """Assinaturas de vídeo e canais de telemetria de um cliente, um por drone assinado."""
+
+    def __init__(self, websocket):
+        """Inicializa a sessão assinando o drone padrão da frota."""
+        self.websocket = websocket
+        self.client_id = id(websocket)
+        self.serializer = get_serializer()
+        self.transport = TRANSPORT_JSON
+        self.resolution = None
+        self.wants_video = True
+        self.telemetry_options = None
+        self.drones = [fleet.default]
+        self.video = {}
+        self.telemetry = {}
+
+    @property
+    def primary(self):
+        """Drone que recebe os comandos sem drone_id (o primeiro assinado)."""
+        return self.drones[0] if self.drones else fleet.default
+
+    def _subscribe_video(self, drone):
+        quality = AdaptiveQuality(min_tier=QUALITY_MIN_TIER, max_tier=QUALITY_MAX_TIER)
+        subscription = drone.frame_hub.subscribe(self.client_id, quality)
+        task = asyncio.create_task(send_video_frames(self.websocket, subscription, drone))
+        self.video[drone.drone_id] = (drone, subscription, task)
+
+    def _start_telemetry(self, drone):
+        rate, use_acks = self.telemetry_options
+        stream = TelemetryStream(rate_hz=rate, keyframe_interval=TELEMETRY_KEYFRAME_INTERVAL, use_acks=use_acks)
+        task = asyncio.create_task(send_telemetry_stream(self.websocket, stream, self.serializer, drone))
+        self.telemetry[drone.drone_id] = (drone, stream, task)
+
+    def _release_video(self, drone_id):
+        drone, subscription, task = self.video.pop(drone_id)
+        task.cancel()
+        drone.frame_hub.unsubscribe(subscription)
+
+    def _release_telemetry(self, drone_id):
+        _, _, task = self.telemetry.pop(drone_id)
+        task.cancel()
+
+    def sync(self):
+        """Ajusta assinaturas e canais aos drones escolhidos e às opções negociadas."""
+        wanted = {drone.drone_id for drone in self.drones}
+        for drone_id in list(self.video):
+            if drone_id not in wanted or not self.wants_video:
+                self._release_video(drone_id)
+        for drone_id in list(self.telemetry):
+            if drone_id not in wanted:
+                self._release_telemetry(drone_id)
         
-        # Enviar resposta ao cliente
-        response = {
-            "type": "command_result",
-            "command": command,
-            "result": result,
-            "timestamp": datetime.now().isoformat(),
-        }
+        for drone in self.drones:
+            if self.wants_video and drone.drone_id not in self.video:
+                self._subscribe_video(drone)
+            if self.telemetry_options and drone.drone_id not in self.telemetry:
+                self._start_telemetry(drone)
         
-        await websocket.send(json.dumps(response))
+        # Codec, transporte e resolução valem para todas as assinaturas
+        for _, subscription, _ in self.video.values():
+            subscription.serializer = self.serializer
+            subscription.transport = self.transport
+            subscription.resolution = self.resolution
+
+    def get_stream(self, drone_id):
+        """Canal de telemetria do drone indicado (ou do drone principal)."""
+        entry = self.telemetry.get(drone_id or self.primary.drone_id)
+        return entry[1] if entry else None
+
+    def close(self):
+        """Cancela as tarefas do cliente e libera suas assinaturas."""
+        for drone_id in list(self.video):
+            self._release_video(drone_id)
+        for drone_id in list(self.telemetry):
+            self._release_telemetry(drone_id)
         
-    except Exception as e:
-        logger.error(f"Erro ao processar comando: {str(e)}")
-        # Enviar erro ao cliente
-        error_response = {
-            "type": "error",
-            "error": str(e),
-            "command": command_data.get("command", "unknown"),
-            "timestamp": datetime.now().isoformat(),
-        }
-        await websocket.send(json.dumps(error_response))
-
-async def handle_client(websocket, path):
+        # Cancelar comandos ainda pendentes deste cliente
+        for drone in fleet:
+            drone.command_scheduler.cancel_owner(self.client_id)
+        analysis_stage.cancel_owner(self.client_id)
+
+def parse_telemetry_rate(value):
+    """Converte a taxa de telemetria pedida pelo cliente para o intervalo (0, TELEMETRY_MAX_HZ].
+    
+    Valores ausentes, não numéricos, não finitos ou não positivos usam a taxa padrão.
+    """
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return TELEMETRY_DEFAULT_HZ
+    if not math.isfinite(rate) or rate <= 0:
+        return TELEMETRY_DEFAULT_HZ
+    return min(rate, TELEMETRY_MAX_HZ)
+
+def resolve_drones(drone_ids):
+    """Converte ids em pipelines da frota, separando os desconhecidos."""
+    drones = []
+    unknown = []
+    for drone_id in drone_ids:
+        drone = fleet.get(drone_id)
+        if drone is None:
+            unknown.append(drone_id)
+        elif drone not in drones:
+            drones.append(drone)
+    return drones, unknown
+
+async def handle_client(websocket, path=None):
     """Gerencia a conexão com um cliente."""
     client_id = id(websocket)
     logger.info(f"Nova conexão: {client_id}")
+    session = ClientSession(websocket)
     
     try:
         # Adicionar cliente à lista de conexões
         connected_clients.add(websocket)
         
         # Enviar confirmação de conexão
-        await websocket.send(json.dumps({
-            "type": "connected",
+        await websocket.send(session.serializer.envelope("connected", {
             "message": "Conectado ao servidor de controle do drone",
-            "timestamp": datetime.now().isoformat(),
+            "transports": [TRANSPORT_JSON, TRANSPORT_BINARY],
+            "codecs": available_codecs(),
+            "drones": fleet.describe(),
+            "readiness": {drone.drone_id: drone.readiness.get_status() for drone in fleet},
         }))
         
-        # Iniciar envio de telemetria em uma tarefa separada
-        telemetry_task = asyncio.create_task(send_telemetry_data(websocket))
+        # Iniciar envio de vídeo do drone padrão (JSON até o cliente negociar)
+        session.sync()
         
         # Processar mensagens recebidas
         async for message in websocket:
@@ -228,11 +659,71 @@ async def handle_client(websocket, path):
                 data = json.loads(message)
                 
                 if data.get("type") == "connect":
-                    # Mensagem de conexão inicial
+                    # Mensagem de conexão inicial: drones assinados (padrão: o primeiro da frota)
+                    requested = data.get("drones") or ([data["drone_id"]] if data.get("drone_id") else None)
+                    if requested:
+                        drones, unknown = resolve_drones(requested)
+                        if unknown:
+                            await websocket.send(session.serializer.envelope("error", {
+                                "error": f"Drones desconhecidos: {', '.join(map(str, unknown))}",
+                            }))
+                        session.drones = drones
+                    
                     use_tello = data.get("useTello", False)
                     if use_tello:
-                        drone_controller.use_real_drone()
-                    logger.info(f"Cliente {client_id} conectado. Usando drone real: {use_tello}")
+                        await session.primary.call(session.primary.drone_controller.use_real_drone)
+                    
+                    # Negociar codec das mensagens e transporte binário de frames
+                    session.serializer = get_serializer(data.get("codec", CODEC_JSON))
+                    if data.get("binary", False):
+                        session.transport = TRANSPORT_BINARY
+                    
+                    # Resolução fixa (metade ou miniatura) em vez do nível adaptativo
+                    resolution = data.get("resolution")
+                    if resolution in RESOLUTION_TIERS:
+                        session.resolution = resolution
+                    
+                    # Clientes só de telemetria não recebem vídeo
+                    session.wants_video = data.get("video", True)
+                    
+                    # Canal de telemetria separado (obrigatório sem o JSON legado de frames)
+                    telemetry_hz = data.get("telemetry_hz")
+                    if session.telemetry_options is None and (telemetry_hz or not session.wants_video
+                                                              or data.get("binary", False)):
+                        rate = parse_telemetry_rate(telemetry_hz)
+                        session.telemetry_options = (rate, data.get("telemetry_ack", False))
+                    
+                    session.sync()
+                    logger.info(f"Cliente {client_id} conectado. Usando drone real: {use_tello}. "
+                                f"Drones: {', '.join(d.drone_id for d in session.drones)}. "
+                                f"Codec: {session.serializer.name} ({session.serializer.backend}). "
+                                f"Vídeo: {session.transport if session.wants_video else 'desativado'}. "
+                                f"Telemetria: {f'{session.telemetry_options[0]:g} Hz' if session.telemetry_options else 'no frame'}")
+                
+                elif data.get("type") in ("subscribe", "unsubscribe"):
+                    # Adicionar ou remover drones assinados nesta conexão
+                    drones, unknown = resolve_drones(data.get("drones") or [])
+                    if unknown:
+                        await websocket.send(session.serializer.envelope("error", {
+                            "error": f"Drones desconhecidos: {', '.join(map(str, unknown))}",
+                        }))
+                    if data["type"] == "subscribe":
+                        session.drones += [drone for drone in drones if drone not in session.drones]
+                    else:
+                        session.drones = [drone for drone in session.drones if drone not in drones]
+                    session.sync()
+                
+                elif data.get("type") == "telemetry_ack":
+                    # Confirmação do último snapshot de telemetria recebido
+                    stream = session.get_stream(data.get("drone_id"))
+                    if stream:
+                        stream.acknowledge(data.get("seq"))
+                
+                elif data.get("type") == "telemetry_keyframe":
+                    # Cliente pediu ressincronização completa
+                    stream = session.get_stream(data.get("drone_id"))
+                    if stream:
+                        stream.request_keyframe()
                 
                 elif data.get("type") == "disconnect":
                     # Mensagem de desconexão
@@ -240,55 +731,144 @@ async def handle_client(websocket, path):
                     break
                 
                 else:
-                    # Processar comando
-                    await handle_command(websocket, data)
+                    # Enfileirar comando no agendador do drone (não bloqueia a leitura de novos comandos)
+                    await handle_command(websocket, data, session.serializer, session.primary)
                     
             except json.JSONDecodeError:
                 logger.error(f"Mensagem inválida recebida: {message}")
-                await websocket.send(json.dumps({
-                    "type": "error",
+                await websocket.send(session.serializer.envelope("error", {
                     "error": "Formato de mensagem inválido",
-                    "timestamp": datetime.now().isoformat(),
                 }))
         
-        # Cancelar tarefa de telemetria
-        telemetry_task.cancel()
-        
     except websockets.exceptions.ConnectionClosed:
         logger.info(f"Conexão fechada: {client_id}")
     except Exception as e:
         logger.error(f"Erro na conexão {client_id}: {str(e)}")
     finally:
+        # Cancelar tarefas de vídeo e telemetria, liberar as assinaturas e os comandos pendentes
+        session.close()
+        
         # Remover cliente da lista de conexões
         if websocket in connected_clients:
             connected_clients.remove(websocket)
         logger.info(f"Cliente desconectado: {client_id}")
 
-async def main():
-    """Função principal do servidor."""
-    # Inicializar controlador do drone
-    drone_controller.initialize()
-    
-    # Inicializar controlador de IA
+# Detector compartilhado, carregado e aquecido uma única vez para toda a frota
+detector = None
+detector_lock = threading.Lock()
+
+def load_detector():
+    """Carrega e aquece o detector na primeira chamada; as seguintes reaproveitam a mesma instância."""
+    global detector
+    with detector_lock:
+        if detector is None:
+            backend = OpenCVDNNDetector(DETECTOR_MODEL, DETECTOR_CONFIG, DETECTOR_LABELS,
+                                        input_size=(DETECTOR_INPUT_SIZE, DETECTOR_INPUT_SIZE))
+            batching = BatchingDetector(backend, max_batch=DETECTOR_MAX_BATCH,
+                                        max_wait=DETECTOR_BATCH_WAIT_MS / 1000)
+            batching.start()
+            detector = batching
+        return detector
+
+def initialize_ai(ai_controller):
+    """Inicializa a IA do drone e conecta o detector compartilhado, se houver modelo configurado."""
     ai_controller.initialize()
+    if DETECTOR_MODEL:
+        ai_controller.set_detector(load_detector())
+    return True
+
+async def initialize_drone(drone):
+    """Inicializa drone, IA e vídeo de um drone em paralelo, com tempos limite."""
+    readiness = drone.readiness
     
-    # Inicializar processador de vídeo
-    video_processor.initialize()
+    async def initialize_video():
+        if REPLAY_LOG and drone is fleet.default:
+            # Reproduzir uma sessão gravada no lugar da câmera (frames já trazem overlay e IA)
+            drone.replay_source = ReplaySource(REPLAY_LOG, speed=REPLAY_SPEED, loop=REPLAY_LOOP)
+            drone.video_processor = drone.replay_source
+            await readiness.run("video", drone.video_processor.initialize, timeout=INIT_TIMEOUT)
+            return
+        
+        # Só o primeiro drone usa a câmera local ou a fonte configurada; cv2.VideoCapture
+        # pode travar sem câmera ou com um stream inacessível
+        source = create_source(VIDEO_SOURCE, speed=SOURCE_SPEED, loop=SOURCE_LOOP) if drone is fleet.default else None
+        use_camera = drone is fleet.default and source is None and VIDEO_SOURCE != "simulation"
+        external = use_camera or source is not None
+        ready = await readiness.run("video", drone.video_processor.initialize, use_camera, source,
+                                    timeout=CAMERA_TIMEOUT if external else INIT_TIMEOUT)
+        if not ready and external:
+            logger.warning(f"Fonte de vídeo do drone {drone.drone_id} indisponível, usando simulação")
+            await readiness.run("video", drone.video_processor.initialize, False,
+                                timeout=INIT_TIMEOUT, detail="simulation_fallback")
+        
+        # Conectar processador de vídeo ao controlador de IA
+        drone.video_processor.set_ai_controller(drone.ai_controller)
     
-    # Conectar processador de vídeo ao controlador de IA
-    video_processor.set_ai_controller(ai_controller)
+    await asyncio.gather(
+        readiness.run("drone", drone.drone_controller.initialize, timeout=INIT_TIMEOUT),
+        readiness.run("ai", initialize_ai, drone.ai_controller,
+                      timeout=DETECTOR_TIMEOUT if DETECTOR_MODEL else INIT_TIMEOUT),
+        initialize_video(),
+    )
+
+async def initialize_fleet():
+    """Inicializa todos os drones da frota em paralelo."""
+    start_time = time.monotonic()
+    await asyncio.gather(*[initialize_drone(drone) for drone in fleet])
+    ready = sum(1 for drone in fleet if drone.readiness.all_ready())
+    logger.info(f"Frota inicializada em {time.monotonic() - start_time:.2f}s: "
+                f"{ready}/{len(fleet)} drone(s) prontos")
+
+def initialize_components():
+    """Inicializa a frota de forma bloqueante (usado pelo worker de captura no modo multiprocesso)."""
+    asyncio.run(initialize_fleet())
+
+async def serve(reuse_port=False, metrics_port=METRICS_PORT):
+    """Inicia métricas, os pipelines da frota e o servidor WebSocket."""
+    # Iniciar endpoint de métricas (Prometheus)
+    if metrics_port > 0:
+        await start_metrics_server(METRICS_HOST, metrics_port)
     
-    # Iniciar servidor WebSocket
+    # Iniciar agendadores, loops de controle e produtores de frames de cada drone
+    fleet.start()
+    
+    # Iniciar servidor WebSocket (com SO_REUSEPORT, vários gateways compartilham a porta)
     ws_url = f"ws://{HOST}:{PORT}{WS_PATH}"
-    async with websockets.serve(handle_client, HOST, PORT):
+    async with websockets.serve(handle_client, HOST, PORT, reuse_port=reuse_port or None):
         logger.info(f"Servidor iniciado em {ws_url}")
         await asyncio.Future()  # Executar indefinidamente
 
+async def main():
+    """Função principal do servidor."""
+    global session_recorder
+    
+    # Inicializar componentes em segundo plano: o socket é aberto imediatamente
+    # e o estado de cada componente aparece em "connected" e em get_info
+    asyncio.create_task(initialize_fleet())
+    
+    # Gravar a sessão completa do drone padrão em log indexado
+    if SESSION_LOG:
+        session_recorder = SessionRecorder(SESSION_LOG)
+        asyncio.create_task(record_session(session_recorder, fleet.default))
+    
+    try:
+        await serve()
+    finally:
+        if session_recorder:
+            session_recorder.close()
+        for drone in fleet:
+            if drone.video_recorder:
+                drone.video_recorder.stop()
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if GATEWAY_PROCESSES > 0:
+            # Um processo de captura/IA e vários gateways WebSocket
+            from gateway import run_multiprocess
+            run_multiprocess(sys.modules[__name__], GATEWAY_PROCESSES)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Servidor encerrado pelo usuário")
     except Exception as e:
         logger.error(f"Erro ao iniciar servidor: {str(e)}")
-
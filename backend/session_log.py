@@ -0,0 +1,341 @@
+import bisect
+import json
+import logging
+import mmap
+import struct
+import threading
+import time
+import cv2
+import numpy as np
+from frame_publisher import FramePublisher
+
+logger = logging.getLogger("session-log")
+
+# Cabeçalho do arquivo: magic, versão, reservado, início da sessão (epoch ms)
+FILE_HEADER = struct.Struct("<4sHHQ")
+FILE_MAGIC = b"DRSL"
+FILE_VERSION = 1
+
+# Cabeçalho de cada registro: tipo (u8), tamanho do payload (u32), timestamp em ms (u64)
+RECORD_HEADER = struct.Struct("<B3xIQ")
+
+# Rodapé gravado no fechamento: offset do índice, número de entradas, magic
+FOOTER = struct.Struct("<QI4s")
+FOOTER_MAGIC = b"DRSX"
+
+# Entrada do índice de busca: timestamp em ms e offset do início do tick
+INDEX_ENTRY = struct.Struct("<QQ")
+
+# Tipos de registro
+KIND_TELEMETRY = 1
+KIND_DETECTIONS = 2
+KIND_FRAME = 3
+KIND_COMMAND = 4
+KIND_INDEX = 5
+
+# Intervalo máximo entre flushes do arquivo, em segundos
+FLUSH_INTERVAL = 1.0
+
+
+class SessionRecorder:
+    """Grava uma sessão de voo em um log append-only com índice de busca.
+
+    Cada tick grava telemetria, detecções e o JPEG do frame em sequência; o índice
+    aponta para o início de cada tick e é gravado no fim do arquivo ao fechar.
+    Comandos são gravados à parte, no momento em que chegam.
+    """
+
+    def __init__(self, path):
+        """Cria o arquivo de log e grava o cabeçalho."""
+        self.path = path
+        self.file = open(path, "wb", buffering=1024 * 1024)
+        self.start_ms = int(time.time() * 1000)
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, 0, self.start_ms))
+        self.offset = FILE_HEADER.size
+        self.index = []
+        self.records = 0
+        self.bytes_written = FILE_HEADER.size
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        logger.info(f"Gravando sessão em {path}")
+
+    def _write(self, kind, payload, timestamp_ms):
+        self.file.write(RECORD_HEADER.pack(kind, len(payload), timestamp_ms))
+        self.file.write(payload)
+        size = RECORD_HEADER.size + len(payload)
+        self.offset += size
+        self.bytes_written += size
+        self.records += 1
+
+    def _maybe_flush(self):
+        now = time.monotonic()
+        if now - self.last_flush >= FLUSH_INTERVAL:
+            self.file.flush()
+            self.last_flush = now
+
+    def record_tick(self, jpeg, snapshot, detections, timestamp_ms=None):
+        """Grava um tick completo (telemetria, detecções e frame) e o adiciona ao índice."""
+        timestamp_ms = timestamp_ms or int(time.time() * 1000)
+        with self.lock:
+            if self.file is None:
+                return
+            self.index.append((timestamp_ms, self.offset))
+            self._write(KIND_TELEMETRY, json.dumps(snapshot).encode("utf-8"), timestamp_ms)
+            self._write(KIND_DETECTIONS, json.dumps(detections).encode("utf-8"), timestamp_ms)
+            self._write(KIND_FRAME, bytes(jpeg), timestamp_ms)
+            self._maybe_flush()
+
+    def record_command(self, client_id, command, params):
+        """Grava um comando recebido de um cliente."""
+        payload = json.dumps({"client_id": str(client_id), "command": command, "params": params},
+                             default=str).encode("utf-8")
+        with self.lock:
+            if self.file is None:
+                return
+            self._write(KIND_COMMAND, payload, int(time.time() * 1000))
+            self._maybe_flush()
+
+    def close(self):
+        """Grava o índice e o rodapé e fecha o arquivo."""
+        with self.lock:
+            if self.file is None:
+                return
+            index_offset = self.offset
+            payload = b"".join(INDEX_ENTRY.pack(ts, offset) for ts, offset in self.index)
+            self._write(KIND_INDEX, payload, int(time.time() * 1000))
+            self.file.write(FOOTER.pack(index_offset, len(self.index), FOOTER_MAGIC))
+            self.file.close()
+            self.file = None
+        logger.info(f"Sessão gravada em {self.path}: {len(self.index)} frames, {self.bytes_written} bytes")
+
+    def get_stats(self):
+        """Retorna o tamanho e o número de registros gravados."""
+        return {
+            "path": self.path,
+            "frames": len(self.index),
+            "records": self.records,
+            "bytes": self.bytes_written,
+        }
+
+
+class SessionLog:
+    """Leitura de um log de sessão mapeado em memória; payloads são views sem cópia."""
+
+    def __init__(self, path):
+        """Mapeia o arquivo e carrega (ou reconstrói) o índice de busca."""
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        magic, version, _, self.start_ms = FILE_HEADER.unpack_from(self.map, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f"{path} não é um log de sessão compatível")
+
+        self.end = len(self.map)
+        self.index = self._read_index()
+        self.timestamps = [ts for ts, _ in self.index]
+        logger.info(f"Log de sessão {path}: {len(self.index)} frames, {self.duration:.1f}s")
+
+    def _read_index(self):
+        """Lê o índice do rodapé; sem rodapé (gravação interrompida), varre o arquivo."""
+        if len(self.map) >= FILE_HEADER.size + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+            if magic == FOOTER_MAGIC:
+                self.end = index_offset
+                start = index_offset + RECORD_HEADER.size
+                return [INDEX_ENTRY.unpack_from(self.map, start + i * INDEX_ENTRY.size) for i in range(count)]
+
+        logger.warning(f"Log {self.path} sem índice (gravação interrompida), reconstruindo")
+        index = []
+        for kind, timestamp_ms, _, offset in self.records(FILE_HEADER.size):
+            if kind == KIND_TELEMETRY:
+                index.append((timestamp_ms, offset))
+        return index
+
+    @property
+    def duration(self):
+        """Duração da sessão em segundos."""
+        if not self.index:
+            return 0.0
+        return (self.index[-1][0] - self.index[0][0]) / 1000
+
+    def records(self, offset):
+        """Itera (tipo, timestamp ms, payload, offset) a partir do offset indicado."""
+        while offset + RECORD_HEADER.size <= self.end:
+            kind, length, timestamp_ms = RECORD_HEADER.unpack_from(self.map, offset)
+            payload_start = offset + RECORD_HEADER.size
+            if payload_start + length > self.end:
+                # Registro truncado no fim de uma gravação interrompida
+                return
+            yield kind, timestamp_ms, self.view[payload_start:payload_start + length], offset
+            offset = payload_start + length
+
+    def seek(self, position):
+        """Retorna (timestamp ms, offset) do último tick em ou antes da posição (segundos desde o início)."""
+        if not self.index:
+            return None
+        target = self.index[0][0] + int(position * 1000)
+        i = max(0, bisect.bisect_right(self.timestamps, target) - 1)
+        return self.index[i]
+
+    def close(self):
+        """Libera o mapeamento e o arquivo."""
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+
+class ReplaySource:
+    """Substitui o VideoProcessor reproduzindo um log de sessão pelo protocolo normal.
+
+    Uma thread avança pelos registros respeitando a velocidade (1.0 = tempo real,
+    0 = o mais rápido possível); frames são decodificados só quando pedidos.
+    """
+
+    video_source = "replay"
+
+    def __init__(self, path, speed=1.0, loop=True):
+        """Abre o log de sessão a reproduzir."""
+        self.log = SessionLog(path)
+        self.speed = speed
+        self.loop = loop
+        self.paused = False
+        # Só a sequência é publicada: o JPEG é decodificado quando alguém pede o frame
+        self.frames = FramePublisher()
+        self.position = 0.0
+        self.width = 640
+        self.height = 480
+        self.snapshot = None
+        self.detections = []
+        self.commands = 0
+        self.finished = False
+        self._jpeg = None
+        self._decoded = None
+        self._decoded_count = -1
+        self._seek_to = None
+        self._wakeup = threading.Event()
+        self._decode_lock = threading.Lock()
+
+    def initialize(self):
+        """Inicia a thread de reprodução."""
+        threading.Thread(target=self._replay_loop, daemon=True).start()
+        return True
+
+    def seek(self, position):
+        """Pede um salto para a posição indicada (segundos desde o início da sessão)."""
+        self._seek_to = max(0.0, min(float(position), self.log.duration))
+        self._wakeup.set()
+
+    def set_speed(self, speed):
+        """Altera a velocidade de reprodução (0 = o mais rápido possível)."""
+        self.speed = max(0.0, float(speed))
+        self._wakeup.set()
+
+    def set_paused(self, paused):
+        """Pausa ou retoma a reprodução."""
+        self.paused = paused
+        self._wakeup.set()
+
+    def _replay_loop(self):
+        """Percorre os registros do log no ritmo da velocidade configurada."""
+        log = self.log
+        if not log.index:
+            logger.error(f"Log {log.path} não contém frames")
+            return
+        first_ms = log.index[0][0]
+        offset = log.index[0][1]
+
+        while True:
+            # Âncora: instante real e da sessão a partir dos quais o ritmo é calculado
+            anchor_wall = time.monotonic()
+            anchor_ms = None
+            restart = False
+            for kind, timestamp_ms, payload, record_offset in log.records(offset):
+                if self._seek_to is not None:
+                    _, offset = log.seek(self._seek_to)
+                    self._seek_to = None
+                    restart = True
+                    break
+                while self.paused and self._seek_to is None:
+                    self._wakeup.wait(0.1)
+                    self._wakeup.clear()
+                    anchor_ms = None
+                if self._seek_to is not None:
+                    continue
+
+                if anchor_ms is None:
+                    anchor_wall, anchor_ms = time.monotonic(), timestamp_ms
+                if self.speed > 0:
+                    delay = anchor_wall + (timestamp_ms - anchor_ms) / 1000 / self.speed - time.monotonic()
+                    if delay > 0:
+                        self._wakeup.clear()
+                        if self._wakeup.wait(delay):
+                            # Velocidade, pausa ou posição mudou: recalcular a âncora
+                            anchor_ms = None
+                            if self._seek_to is not None:
+                                _, offset = log.seek(self._seek_to)
+                                self._seek_to = None
+                                restart = True
+                                break
+
+                self.position = (timestamp_ms - first_ms) / 1000
+                if kind == KIND_TELEMETRY:
+                    self.snapshot = json.loads(bytes(payload))
+                elif kind == KIND_DETECTIONS:
+                    self.detections = json.loads(bytes(payload))
+                elif kind == KIND_FRAME:
+                    self._jpeg = payload
+                    self.frames.publish(None)
+                elif kind == KIND_COMMAND:
+                    self.commands += 1
+
+            if restart:
+                continue
+            if not self.loop:
+                self.finished = True
+                logger.info("Reprodução da sessão concluída")
+                return
+            offset = log.index[0][1]
+            if self.speed > 0:
+                # Pausa de um frame entre voltas, mesmo em logs com timestamps iguais
+                self._wakeup.wait(1/30)
+
+    @property
+    def frame_count(self):
+        """Sequência do último frame reproduzido."""
+        return self.frames.sequence
+
+    def get_frame(self):
+        """Decodifica (uma vez por frame) e retorna o frame atual da sessão, somente leitura."""
+        with self._decode_lock:
+            frame_count = self.frame_count
+            if self._decoded_count != frame_count:
+                jpeg = self._jpeg
+                if jpeg is None:
+                    return np.zeros((self.height, self.width, 3), dtype=np.uint8)
+                self._decoded = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                self._decoded.flags.writeable = False
+                self._decoded_count = frame_count
+                self.height, self.width = self._decoded.shape[:2]
+            return self._decoded
+
+    def get_snapshot(self):
+        """Retorna o último snapshot de telemetria reproduzido."""
+        if self.snapshot is None:
+            raise RuntimeError("Reprodução ainda não chegou ao primeiro frame")
+        return self.snapshot
+
+    def get_stats(self):
+        """Retorna o estado da reprodução."""
+        return {
+            "path": self.log.path,
+            "position": round(self.position, 3),
+            "duration": round(self.log.duration, 3),
+            "speed": self.speed,
+            "paused": self.paused,
+            "loop": self.loop,
+            "finished": self.finished,
+            "frames": self.frame_count,
+            "commands": self.commands,
+        }
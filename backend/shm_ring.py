@@ -0,0 +1,147 @@
+import logging
+import struct
+import time
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+
+logger = logging.getLogger("shm-ring")
+
+# Cabeçalho do anel: magic, versão, slots, largura, altura, tamanho máximo dos metadados, última sequência
+RING_HEADER = struct.Struct("<IIIIIIQ")
+RING_MAGIC = 0x44524E46  # "DRNF"
+RING_VERSION = 1
+
+# Cabeçalho de cada slot: sequência no início da escrita, sequência no fim da escrita,
+# timestamp em ms e tamanho dos metadados
+SLOT_HEADER = struct.Struct("<QQQI4x")
+
+
+def _attach_untracked(name):
+    """Abre um segmento existente sem registrá-lo no resource_tracker deste processo.
+
+    Sem isso, o Python < 3.13 remove o segmento quando qualquer leitor termina.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class SharedFrameRing:
+    """Anel de frames em memória compartilhada: um escritor (captura/IA) e vários leitores (gateways).
+
+    Cada slot usa um seqlock: o escritor grava a sequência no início, copia frame e
+    metadados e grava a mesma sequência no fim. Leitores obtêm views sem cópia e
+    conferem com is_current() se o slot não foi sobrescrito enquanto o usavam.
+    """
+
+    def __init__(self, shm, slots, width, height, max_meta, owner):
+        """Use SharedFrameRing.create ou SharedFrameRing.attach."""
+        self.shm = shm
+        self.slots = slots
+        self.width = width
+        self.height = height
+        self.max_meta = max_meta
+        self.owner = owner
+        self.frame_size = width * height * 3
+        self.slot_size = SLOT_HEADER.size + max_meta + self.frame_size
+        self.buffer = shm.buf
+
+        # Views numpy (sem cópia) sobre a área de frame de cada slot
+        self.frames = []
+        for index in range(slots):
+            offset = self._slot_offset(index) + SLOT_HEADER.size + max_meta
+            frame = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self.buffer, offset=offset)
+            self.frames.append(frame)
+
+    @classmethod
+    def create(cls, name, width, height, slots=8, max_meta=4096):
+        """Cria o segmento de memória compartilhada (lado do escritor)."""
+        slot_size = SLOT_HEADER.size + max_meta + width * height * 3
+        shm = shared_memory.SharedMemory(name=name, create=True, size=RING_HEADER.size + slots * slot_size)
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, slots, width, height, max_meta, 0)
+        for index in range(slots):
+            SLOT_HEADER.pack_into(shm.buf, RING_HEADER.size + index * slot_size, 0, 0, 0, 0)
+        logger.info(f"Anel de frames criado: {name} ({slots} slots de {width}x{height})")
+        return cls(shm, slots, width, height, max_meta, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Abre um anel existente (lado do leitor)."""
+        shm = _attach_untracked(name)
+        magic, version, slots, width, height, max_meta, _ = RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            shm.close()
+            raise ValueError(f"Segmento {name} não é um anel de frames compatível")
+        return cls(shm, slots, width, height, max_meta, owner=False)
+
+    def _slot_offset(self, index):
+        return RING_HEADER.size + index * self.slot_size
+
+    @property
+    def latest_sequence(self):
+        """Sequência do último frame publicado (0 se nenhum)."""
+        return RING_HEADER.unpack_from(self.buffer, 0)[6]
+
+    def publish(self, frame, meta=b"", timestamp_ms=None):
+        """Copia o frame e os metadados para o próximo slot e o publica (timestamp_ms: instante da captura)."""
+        if len(meta) > self.max_meta:
+            raise ValueError(f"Metadados excedem {self.max_meta} bytes")
+        sequence = self.latest_sequence + 1
+        index = sequence % self.slots
+        offset = self._slot_offset(index)
+
+        # Início da escrita: leitores deste slot passam a vê-lo como inválido
+        struct.pack_into("<Q", self.buffer, offset, sequence)
+        if frame.shape != self.frames[index].shape:
+            # Frames de tamanho diferente (por exemplo, a tela de espera) são ajustados ao anel
+            frame = cv2.resize(frame, (self.width, self.height))
+        np.copyto(self.frames[index], frame)
+        meta_offset = offset + SLOT_HEADER.size
+        self.buffer[meta_offset:meta_offset + len(meta)] = meta
+        SLOT_HEADER.pack_into(self.buffer, offset, sequence, sequence,
+                              timestamp_ms or int(time.time() * 1000), len(meta))
+
+        # Fim da escrita: publicar a nova sequência
+        struct.pack_into("<Q", self.buffer, RING_HEADER.size - 8, sequence)
+        return sequence
+
+    def read_latest(self):
+        """Retorna (sequência, frame somente leitura, metadados, timestamp ms) do último slot, ou None."""
+        sequence = self.latest_sequence
+        if sequence == 0:
+            return None
+        index = sequence % self.slots
+        begin, end, timestamp_ms, meta_len = SLOT_HEADER.unpack_from(self.buffer, self._slot_offset(index))
+        if begin != sequence or end != sequence:
+            # Slot em escrita (o escritor já está à frente): tratar como sem frame novo
+            return None
+        meta_offset = self._slot_offset(index) + SLOT_HEADER.size
+        meta = bytes(self.buffer[meta_offset:meta_offset + meta_len])
+        frame = self.frames[index].view()
+        frame.flags.writeable = False
+        return sequence, frame, meta, timestamp_ms
+
+    def is_current(self, sequence):
+        """Indica se o slot da sequência ainda não foi sobrescrito."""
+        begin = struct.unpack_from("<Q", self.buffer, self._slot_offset(sequence % self.slots))[0]
+        return begin == sequence
+
+    def close(self):
+        """Libera o segmento (e o remove, no lado do escritor)."""
+        self.frames = []
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger("startup")
+
+# Estados de inicialização de um componente
+STATE_PENDING = "pending"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+STATE_TIMEOUT = "timeout"
+
+
+class ComponentReadiness:
+    """Estado de inicialização dos componentes de um drone (pendente, pronto, falhou ou tempo esgotado)."""
+
+    def __init__(self, owner, names=()):
+        """Inicializa o rastreador com os componentes conhecidos como pendentes."""
+        self.owner = owner
+        self.components = {}
+        for name in names:
+            self.set_state(name, STATE_PENDING)
+
+    def set_state(self, name, state, error=None, seconds=None, detail=None):
+        """Registra o estado de um componente."""
+        self.components[name] = {
+            "state": state,
+            "seconds": round(seconds, 3) if seconds is not None else None,
+            "error": error,
+            "detail": detail,
+        }
+
+    async def run(self, name, func, *args, timeout=None, detail=None):
+        """Executa func(*args) em uma thread própria, com tempo limite, e registra o resultado.
+
+        Uma thread daemon é usada em vez de um executor: se a chamada travar (por exemplo,
+        cv2.VideoCapture em máquinas sem câmera), ela não impede o encerramento do processo.
+        Retorna True se o componente ficou pronto.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        start_time = time.monotonic()
+        self.set_state(name, STATE_PENDING)
+
+        def target():
+            try:
+                result = func(*args)
+            except Exception as e:
+                loop.call_soon_threadsafe(lambda error=e: future.done() or future.set_exception(error))
+            else:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+
+        threading.Thread(target=target, name=f"init-{self.owner}-{name}", daemon=True).start()
+        try:
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.set_state(name, STATE_TIMEOUT, error=f"Sem resposta em {timeout:g}s",
+                           seconds=time.monotonic() - start_time)
+            logger.warning(f"{self.owner}/{name}: inicialização excedeu {timeout:g}s")
+            return False
+        except Exception as e:
+            self.set_state(name, STATE_FAILED, error=str(e), seconds=time.monotonic() - start_time)
+            logger.error(f"{self.owner}/{name}: falha na inicialização: {str(e)}")
+            return False
+
+        if result is False:
+            self.set_state(name, STATE_FAILED, error="Inicialização retornou False",
+                           seconds=time.monotonic() - start_time)
+            return False
+        self.set_state(name, STATE_READY, seconds=time.monotonic() - start_time, detail=detail)
+        logger.info(f"{self.owner}/{name}: pronto em {time.monotonic() - start_time:.2f}s")
+        return True
+
+    def is_ready(self, name):
+        """Indica se o componente está pronto."""
+        entry = self.components.get(name)
+        return entry is not None and entry["state"] == STATE_READY
+
+    def all_ready(self):
+        """Indica se todos os componentes conhecidos estão prontos."""
+        return all(entry["state"] == STATE_READY for entry in self.components.values())
+
+    def get_status(self):
+        """Retorna o estado de cada componente e se todos estão prontos."""
+        return {
+            "ready": self.all_ready(),
+            "components": {name: dict(entry) for name, entry in self.components.items()},
+        }
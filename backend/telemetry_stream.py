@@ -0,0 +1,127 @@
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("telemetry-stream")
+
+
+def flatten_snapshot(snapshot, prefix=""):
+    """Achata um snapshot aninhado em campos com caminho pontuado ("state.atitude.yaw")."""
+    fields = {}
+    for key, value in snapshot.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            fields.update(flatten_snapshot(value, f"{path}."))
+        else:
+            fields[path] = value
+    return fields
+
+
+class TelemetrySampler:
+    """Coleta snapshots de telemetria, reaproveitando a mesma amostra entre clientes no mesmo instante."""
+
+    def __init__(self, build_snapshot, min_interval=0.01):
+        """Inicializa o amostrador com a função que monta o snapshot completo."""
+        self.build_snapshot = build_snapshot
+        self.min_interval = min_interval
+        self.last_sample_time = 0.0
+        self.last_fields = None
+
+    def sample(self):
+        """Retorna os campos achatados do snapshot mais recente."""
+        now = time.monotonic()
+        if self.last_fields is None or now - self.last_sample_time >= self.min_interval:
+            self.last_fields = flatten_snapshot(self.build_snapshot())
+            self.last_sample_time = now
+        return self.last_fields
+
+
+class TelemetryStream:
+    """Canal de telemetria de um cliente, com taxa própria, envio delta e keyframes periódicos.
+
+    Cada mensagem carrega apenas os campos que mudaram em relação ao último snapshot
+    confirmado pelo cliente ("telemetry_ack"). Clientes que não confirmam usam como base
+    o último snapshot enviado, já que o WebSocket entrega as mensagens em ordem.
+    """
+
+    def __init__(self, rate_hz=10.0, keyframe_interval=2.0, use_acks=False, history_size=64):
+        """Inicializa o canal de telemetria."""
+        self.rate_hz = rate_hz
+        self.keyframe_interval = keyframe_interval
+        self.use_acks = use_acks
+        self.history_size = history_size
+
+        self.sequence = 0
+        self.history = OrderedDict()
+        self.base_sequence = None
+        self.last_keyframe_time = 0.0
+        self.keyframes = 0
+        self.deltas = 0
+        self.skipped = 0
+
+    @property
+    def interval(self):
+        """Intervalo entre mensagens, em segundos."""
+        return 1.0 / self.rate_hz
+
+    def acknowledge(self, sequence):
+        """Registra a confirmação do cliente para um snapshot enviado."""
+        if sequence in self.history:
+            self.base_sequence = sequence
+            # Snapshots anteriores ao confirmado não serão mais usados como base
+            while next(iter(self.history)) != sequence:
+                self.history.popitem(last=False)
+
+    def request_keyframe(self):
+        """Força o envio de um keyframe na próxima mensagem (por exemplo, para ressincronizar)."""
+        self.base_sequence = None
+        self.last_keyframe_time = 0.0
+
+    def next_message(self, fields):
+        """Monta os campos da próxima mensagem "telemetry", ou None se nada mudou desde a base."""
+        now = time.monotonic()
+        base = self.history.get(self.base_sequence) if self.base_sequence is not None else None
+        keyframe = base is None or now - self.last_keyframe_time >= self.keyframe_interval
+
+        if keyframe:
+            changed = fields
+        else:
+            changed = {key: value for key, value in fields.items() if base.get(key) != value}
+            if not changed:
+                self.skipped += 1
+                return None
+
+        self.sequence += 1
+        self.history[self.sequence] = fields
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+
+        if keyframe:
+            self.keyframes += 1
+            self.last_keyframe_time = now
+        else:
+            self.deltas += 1
+
+        message = {
+            "seq": self.sequence,
+            "base": None if keyframe else self.base_sequence,
+            "keyframe": keyframe,
+            "fields": changed,
+        }
+
+        if not self.use_acks:
+            # Sem confirmações, a entrega ordenada do WebSocket garante que o cliente terá este snapshot
+            self.base_sequence = self.sequence
+
+        return message
+
+    def get_stats(self):
+        """Retorna estatísticas do canal."""
+        return {
+            "rate_hz": self.rate_hz,
+            "sequence": self.sequence,
+            "acked": self.base_sequence,
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "skipped": self.skipped,
+        }
@@ -3,54 +3,138 @@ import cv2
 import numpy as np
 import time
 import os
-from threading import Thread
+from collections import deque
+from threading import Lock, Thread
+from change_detector import ChangeDetector
+from frame_pool import FramePool
+from frame_publisher import FramePublisher
+from frame_ring import FrameRing
+from image_pyramid import ImagePyramid
+from metrics import REGISTRY
+from overlay import SpriteCache
+from pipeline_stage import PipelineStage
+from video_sources import CameraSource, SimulatedSource
 
 logger = logging.getLogger("video-processor")
 
+# Métricas do pipeline de vídeo
+CAPTURE_SECONDS = REGISTRY.histogram("drone_capture_seconds", "Tempo de captura ou geração de um frame")
+OVERLAY_SECONDS = REGISTRY.histogram("drone_overlay_seconds", "Tempo de desenho do overlay de informações")
+FRAMES_PROCESSED = REGISTRY.counter("drone_frames_processed_total", "Frames processados pelo pipeline de vídeo")
+CAPTURE_FAILURES = REGISTRY.counter("drone_capture_failures_total", "Falhas de captura da fonte de vídeo")
+FRAMES_DROPPED = REGISTRY.counter("drone_capture_dropped_frames_total", "Frames capturados e descartados sem processamento")
+FRAMES_LATE = REGISTRY.counter("drone_capture_late_frames_total", "Frames capturados depois do prazo")
+FRAMES_STATIC = REGISTRY.counter("drone_static_frames_total", "Frames de cena estática que reaproveitaram o frame publicado anterior")
+
+# Slots do anel de captura
+RING_SLOTS = 4
+
+# Marcador repassado pelo estágio de IA em cena estática: o overlay reaproveita a própria última saída
+STATIC_FRAME = object()
+
 class VideoProcessor:
-    """Processa o vídeo do drone e aplica efeitos visuais."""
+    """Processa o vídeo do drone e aplica efeitos visuais.
+    
+    O processamento é um pipeline em estágios, cada um em sua thread:
+    captura (anel de frames) → IA → overlay e publicação; a codificação roda
+    depois, no estágio de codificação do servidor. Os estágios são ligados por
+    filas pequenas e limitadas, e a vazão fica limitada pelo estágio mais lento.
+    """
     
     def __init__(self):
         """Inicializa o processador de vídeo."""
         self.is_initialized = False
         self.video_source = "simulation"
-        self.cap = None
-        self.current_frame = None
+        self.source = None
         self.processing_enabled = True
         self.last_frame_time = 0
-        self.frame_count = 0
+        
+        # Último frame processado, publicado com número de sequência e somente leitura
+        self.frames = FramePublisher()
+        
+        # Anel de captura e fonte simulada de reserva (criados na inicialização, com a resolução da fonte)
+        self.ring = None
+        self.frame_pool = None
+        self.simulated_source = None
+        self.late_frames = 0
         
         # Configurações de simulação
         self.width = 640
         self.height = 480
         self.overlay_info = True
+        # Sprites dos textos estáticos do HUD (fonte de vídeo), usados só pelo estágio de overlay
+        self.hud_sprites = SpriteCache()
+        
+        # Cena estática: reaproveitar detecções, overlay e codificações do frame anterior
+        self.change_detector = ChangeDetector()
         
         # Referência ao controlador de IA
         self.ai_controller = None
         self.ai_enabled = False
+        
+        # Estágios do pipeline depois da captura (o overlay publica o frame)
+        self.overlay_stage = PipelineStage("overlay", self._overlay_and_publish)
+        self.ai_stage = PipelineStage("ai", self._run_ai, next_stage=self.overlay_stage)
+        self.stages = (self.ai_stage, self.overlay_stage)
+        # Último frame produzido pelo estágio de overlay (só lido e escrito por ele)
+        self.last_output = None
+        # (sequência, instante de captura) dos frames em trânsito nos estágios, em ordem de sequência;
+        # a entrada acrescenta e o estágio de overlay retira, cada um na sua thread
+        self.capture_times = deque()
+        self.capture_times_lock = Lock()
+        
+        # Protege contra duas inicializações (câmera lenta + fallback de simulação)
+        self.init_lock = Lock()
     
-    def initialize(self):
-        """Inicializa o processador de vídeo."""
+    def initialize(self, use_camera=True, source=None):
+        """Inicializa o processador de vídeo.
+        
+        source é uma fonte plugável de video_sources (arquivo, diretório de frames, stream);
+        sem ela, usa a câmera (use_camera=True) ou a simulação. Fontes indisponíveis
+        caem para a simulação.
+        """
         logger.info("Inicializando processador de vídeo")
         
-        # Tentar abrir uma câmera real
-        try:
-            self.cap = cv2.VideoCapture(0)
-            if self.cap.isOpened():
-                self.video_source = "camera"
-                self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                logger.info(f"Câmera conectada: {self.width}x{self.height}")
-            else:
-                logger.warning("Não foi possível abrir a câmera, usando simulação")
-                self.cap = None
-        except Exception as e:
-            logger.error(f"Erro ao abrir câmera: {str(e)}")
-            self.cap = None
-        
-        # Iniciar thread de processamento
-        self.is_initialized = True
-        Thread(target=self._processing_loop, daemon=True).start()
+        if source is None and use_camera:
+            # Tentar abrir uma câmera real (pode demorar segundos em máquinas sem câmera)
+            source = CameraSource(0)
+        elif source is None:
+            logger.info("Câmera desativada, usando simulação")
+        
+        if source is not None:
+            try:
+                opened = source.open()
+            except Exception as e:
+                logger.error(f"Erro ao abrir fonte {source.video_source}: {str(e)}")
+                opened = False
+            if not opened:
+                logger.warning(f"Não foi possível abrir a fonte {source.video_source}, usando simulação")
+                source.close()
+                source = None
+        
+        with self.init_lock:
+            if self.is_initialized:
+                # A simulação já assumiu (a fonte respondeu depois do tempo limite)
+                if source is not None:
+                    source.close()
+                logger.warning("Processador de vídeo já inicializado, ignorando fonte aberta tardiamente")
+                return False
+            
+            if source is not None:
+                self.width = source.width
+                self.height = source.height
+            self.simulated_source = SimulatedSource(self.width, self.height)
+            self.source = source or self.simulated_source
+            self.video_source = self.source.video_source
+            
+            # Iniciar a captura e os estágios de processamento, ligados pelo anel de frames
+            self.ring = FrameRing(self.height, self.width, slots=RING_SLOTS)
+            self.frame_pool = FramePool(self.ring.shape)
+            self.is_initialized = True
+            for stage in self.stages:
+                stage.start()
+            Thread(target=self._capture_loop, daemon=True).start()
+            Thread(target=self._processing_loop, daemon=True).start()
         
         return True
     
@@ -60,83 +144,152 @@ class VideoProcessor:
         self.ai_enabled = ai_controller is not None
         logger.info(f"Controlador de IA {'conectado' if self.ai_enabled else 'desconectado'}")
     
+    def _capture_loop(self):
+        """Captura frames para o anel na taxa da fonte, com ritmo por prazo."""
+        logger.info("Iniciando loop de captura de vídeo")
+        
+        deadline = time.monotonic()
+        
+        while self.processing_enabled:
+            try:
+                sequence, buffer = self.ring.reserve()
+                captured_at = time.time()
+                with CAPTURE_SECONDS.time(source=self.video_source):
+                    captured = self._capture_into(buffer)
+                if not captured:
+                    # Fonte sem frame disponível (fim do arquivo ou prefetch vazio)
+                    deadline = time.monotonic()
+                    continue
+                self.ring.commit(sequence, captured_at)
+            except Exception as e:
+                logger.error(f"Erro no loop de captura: {str(e)}")
+                time.sleep(1)  # Evitar loop infinito em caso de erro
+                deadline = time.monotonic()
+                continue
+            
+            # A câmera bloqueia na leitura (intervalo 0); arquivos seguem a taxa e a velocidade
+            period = self.source.frame_interval
+            if period:
+                # Prazo do próximo frame contado a partir do anterior, não do fim da captura
+                deadline += period
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.late_frames += 1
+                    FRAMES_LATE.inc(source=self.video_source)
+                    if -delay > period:
+                        # Atraso de mais de um frame: reancorar em vez de capturar em rajada
+                        deadline = time.monotonic()
+    
+    def _capture_into(self, buffer):
+        """Escreve o próximo frame da fonte no buffer do anel; retorna False se não havia frame."""
+        if self.source.read_into(buffer):
+            return True
+        
+        CAPTURE_FAILURES.inc(source=self.video_source)
+        if not self.source.simulate_on_failure:
+            return False
+        
+        # Frame simulado como fallback da câmera
+        logger.warning("Falha ao capturar frame da câmera")
+        self.simulated_source.render_into(buffer)
+        return True
+    
     def _processing_loop(self):
-        """Loop de processamento de vídeo em thread separada."""
+        """Entrada do pipeline: entrega ao estágio de IA o frame mais novo do anel quando ele tem vaga."""
         logger.info("Iniciando loop de processamento de vídeo")
         
+        last_sequence = 0
+        
         while self.processing_enabled:
             try:
-                # Capturar frame da câmera ou gerar simulação
-                if self.cap and self.cap.isOpened():
-                    ret, frame = self.cap.read()
-                    if not ret:
-                        logger.warning("Falha ao capturar frame da câmera")
-                        # Criar frame simulado como fallback
-                        frame = self._generate_simulated_frame()
-                else:
-                    # Gerar frame simulado
-                    frame = self._generate_simulated_frame()
-                
-                # Processar o frame com IA se disponível
-                if self.ai_enabled and self.ai_controller:
-                    frame = self.ai_controller.process_frame(frame)
+                # Só ler do anel quando a IA pode receber: o frame entregue é sempre o mais novo
+                if not self.ai_stage.wait_for_room(timeout=1.0):
+                    continue
                 
-                # Adicionar overlay de informações
-                if self.overlay_info:
-                    self._add_overlay(frame)
+                # Cada frame publicado é um array próprio (consumidores o leem sem cópia),
+                # tirado do pool quando ninguém mais referencia um frame antigo
+                frame = self.frame_pool.acquire()
+                sequence = self.ring.read_newest(last_sequence, frame, timeout=1.0)
+                if sequence is None:
+                    continue
+                if last_sequence and sequence - last_sequence > 1:
+                    # Frames capturados enquanto os estágios estavam ocupados
+                    FRAMES_DROPPED.inc(sequence - last_sequence - 1, source=self.video_source)
+                last_sequence = sequence
                 
-                # Atualizar frame atual
-                self.current_frame = frame
-                self.frame_count += 1
-                self.last_frame_time = time.time()
-                
-                # Controlar taxa de frames (30 FPS)
-                time.sleep(1/30)
+                with self.capture_times_lock:
+                    self.capture_times.append((sequence, self.ring.read_timestamp))
+                self.ai_stage.put(sequence, frame)
                 
             except Exception as e:
                 logger.error(f"Erro no loop de processamento: {str(e)}")
                 time.sleep(1)  # Evitar loop infinito em caso de erro
     
-    def _generate_simulated_frame(self):
-        """Gera um frame simulado para quando não há câmera disponível."""
-        # Criar frame base
-        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        
-        # Adicionar grade para simular perspectiva
-        grid_size = 50
-        for i in range(0, self.width, grid_size):
-            cv2.line(frame, (i, 0), (i, self.height), (30, 30, 30), 1)
-        for i in range(0, self.height, grid_size):
-            cv2.line(frame, (0, i), (self.width, i), (30, 30, 30), 1)
-        
-        # Adicionar horizonte
-        horizon_y = self.height // 2
-        cv2.line(frame, (0, horizon_y), (self.width, horizon_y), (0, 120, 255), 2)
-        
-        # Adicionar "céu"
-        frame[:horizon_y, :] = cv2.addWeighted(frame[:horizon_y, :], 0.7, np.ones_like(frame[:horizon_y, :]) * np.array([100, 150, 200]), 0.3, 0)
-        
-        # Adicionar movimento simulado (deslocamento da grade)
-        offset_x = int((time.time() * 10) % grid_size)
-        offset_y = int((time.time() * 5) % grid_size)
-        
-        # Deslocar a grade
-        M = np.float32([[1, 0, offset_x], [0, 1, offset_y]])
-        frame = cv2.warpAffine(frame, M, (self.width, self.height))
-        
-        # Adicionar texto simulado
-        cv2.putText(frame, "SIMULAÇÃO", (self.width//2 - 80, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 165, 255), 2)
-        
-        # Adicionar data e hora
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-        cv2.putText(frame, timestamp, (10, self.height - 10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    def _run_ai(self, sequence, frame):
+        """Estágio de IA: detecção e anotação (detecção no nível reduzido da pirâmide).
+        
+        Em cena estática, repassa o marcador STATIC_FRAME: o estágio de overlay
+        republica a própria última saída, com as detecções, o overlay e as
+        codificações dela.
+        """
+        pyramid = ImagePyramid(frame)
+        if not self.change_detector.changed(pyramid):
+            FRAMES_STATIC.inc(source=self.video_source)
+            return STATIC_FRAME
         
+        if self.ai_enabled and self.ai_controller:
+            frame = self.ai_controller.process_frame(frame, pyramid)
         return frame
     
+    def _overlay_and_publish(self, sequence, frame):
+        """Estágio de overlay: desenha o HUD e publica o frame (acorda quem espera por um frame novo)."""
+        if frame is STATIC_FRAME:
+            # Cena estática: a última saída deste estágio é publicada de novo como está
+            frame = self.last_output
+            if frame is None:
+                return None
+        elif self.overlay_info:
+            with OVERLAY_SECONDS.time():
+                self._add_overlay(frame)
+        
+        self.last_output = frame
+        self.last_frame_time = time.time()
+        self.frames.publish(frame, captured_at=self._pop_capture_time(sequence))
+        FRAMES_PROCESSED.inc()
+        return None
+    
+    def _pop_capture_time(self, sequence):
+        """Retira o instante de captura da sequência (e os de frames perdidos por erro nos estágios)."""
+        with self.capture_times_lock:
+            while self.capture_times and self.capture_times[0][0] < sequence:
+                self.capture_times.popleft()
+            if self.capture_times and self.capture_times[0][0] == sequence:
+                return self.capture_times.popleft()[1]
+        return None
+    
+    @property
+    def frame_count(self):
+        """Sequência do último frame publicado (0 antes do primeiro)."""
+        return self.frames.sequence
+    
+    def get_capture_stats(self):
+        """Retorna os contadores da captura (anel, frames descartados e atrasados) e dos estágios."""
+        return {
+            "source": self.video_source,
+            "processed": self.frame_count,
+            "late": self.late_frames,
+            "source_stats": self.source.get_stats() if self.source else None,
+            "ring": self.ring.get_stats() if self.ring else None,
+            "frame_pool": self.frame_pool.get_stats() if self.frame_pool else None,
+            "stages": {stage.name: stage.get_stats() for stage in self.stages},
+            "motion": self.change_detector.get_stats(),
+            "hud_sprites": self.hud_sprites.get_stats(),
+        }
+    
     def _add_overlay(self, frame):
-        """Adiciona overlay de informações ao frame."""
+        """Adiciona overlay de informações ao frame (no lugar)."""
         # Adicionar contador de frames
         fps = 0
         if self.last_frame_time > 0:
@@ -151,20 +304,20 @@ class VideoProcessor:
         cv2.putText(frame, f"Frame: {self.frame_count}", (10, 40), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
         
-        # Adicionar fonte de vídeo
-        cv2.putText(frame, f"Fonte: {self.video_source}", (10, 60), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        # Adicionar fonte de vídeo (texto estático: sprite em cache, sem rasterizar a cada frame)
+        self.hud_sprites.draw_text(frame, f"Fonte: {self.video_source}", (10, 60))
         
         return frame
     
     def get_frame(self):
-        """Retorna o frame atual processado."""
-        if self.current_frame is None:
+        """Retorna o frame atual processado (somente leitura, sem cópia)."""
+        frame = self.frames.frame
+        if frame is None:
             # Se ainda não temos um frame, criar um frame de espera
             frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
             cv2.putText(frame, "Inicializando câmera...", (self.width//2 - 100, self.height//2), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
             return frame
         
-        return self.current_frame.copy()
+        return frame
 
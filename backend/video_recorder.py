@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import cv2
+from metrics import REGISTRY
+
+logger = logging.getLogger("video-recorder")
+
+FRAMES_RECORDED = REGISTRY.counter("drone_recording_frames_total", "Frames gravados em disco pelo gravador de vídeo")
+RECORDING_DROPPED = REGISTRY.counter("drone_recording_dropped_frames_total", "Frames descartados pelo gravador (fila cheia)")
+
+# Codec dos segmentos: MJPEG em AVI (quadros independentes, legível mesmo se o processo cair)
+SEGMENT_FOURCC = "MJPG"
+SEGMENT_EXTENSION = ".avi"
+# Trilha de telemetria ao lado de cada segmento (uma linha JSON por frame)
+SIDECAR_EXTENSION = ".telemetry.jsonl"
+
+
+class VideoRecorder:
+    """Gravador de vídeo em segundo plano, alimentado pelos frames publicados do pipeline.
+
+    submit() nunca bloqueia: o frame (somente leitura, sem cópia) entra em uma fila
+    limitada e, se ela estiver cheia, é descartado e contado. Uma thread própria
+    codifica e grava os frames em segmentos, trocados por duração ou tamanho, cada
+    um com uma trilha de telemetria ao lado. A gravação nunca atrasa o vídeo ao vivo.
+
+    submit() e stop() rodam em threads diferentes (event loop e worker): o estado de
+    gravação, o enfileiramento e o sinal de fim são protegidos por um lock, para que
+    nenhum frame fique na fila atrás do sinal de fim. Cada gravação tem a sua fila.
+    """
+
+    def __init__(self, directory, name, fps=30, segment_seconds=300, segment_bytes=512 * 1024 * 1024,
+                 queue_size=30):
+        """Inicializa o gravador (a gravação começa em start())."""
+        self.directory = directory
+        self.name = name
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.queue_size = queue_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.is_recording = False
+        self.started_at = None
+
+        # Segmento atual (aberto na thread de gravação, com a resolução do primeiro frame)
+        self.writer = None
+        self.sidecar = None
+        self.segment_path = None
+        self.segment_frames = 0
+        self.segment_size = None
+
+        self.segments = []
+        self.frames_written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        """Inicia a gravação; retorna False se já estiver gravando ou se a anterior ainda está fechando."""
+        with self.lock:
+            if self.is_recording:
+                return False
+            if self.thread is not None and self.thread.is_alive():
+                logger.warning(f"Gravação anterior de {self.name} ainda está sendo finalizada")
+                return False
+            os.makedirs(self.directory, exist_ok=True)
+            # Fila nova: nada da gravação anterior entra no novo segmento
+            self.queue = queue.Queue(maxsize=self.queue_size)
+            self.is_recording = True
+            self.started_at = time.time()
+            self.thread = threading.Thread(target=self._run, args=(self.queue,), name=f"recorder-{self.name}",
+                                           daemon=True)
+            self.thread.start()
+        logger.info(f"Gravação de {self.name} iniciada em {self.directory}")
+        return True
+
+    def stop(self, timeout=5.0):
+        """Encerra a gravação depois de gravar os frames já enfileirados."""
+        with self.lock:
+            if not self.is_recording:
+                return False
+            self.is_recording = False
+            frames, thread = self.queue, self.thread
+        # Sinal de fim (fora do lock, para submit não esperar): depois do último frame, já que
+        # nenhum frame novo entra na fila, e espera uma vaga
+        frames.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Gravação de {self.name} ainda gravando frames enfileirados após {timeout}s")
+        logger.info(f"Gravação de {self.name} encerrada: {self.frames_written} frames, "
+                    f"{len(self.segments)} segmentos, {self.dropped} descartados")
+        return True
+
+    def submit(self, frame, telemetry=None, timestamp=None):
+        """Enfileira um frame para gravação sem bloquear; retorna False se foi descartado."""
+        with self.lock:
+            if not self.is_recording:
+                return False
+            try:
+                self.queue.put_nowait((frame, telemetry, timestamp or time.time()))
+                return True
+            except queue.Full:
+                self.dropped += 1
+                RECORDING_DROPPED.inc(drone=self.name)
+                return False
+
+    def _run(self, frames):
+        """Thread de gravação: codifica os frames da fila e troca de segmento quando necessário."""
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            frame, telemetry, timestamp = item
+            try:
+                if self.writer is None or self._segment_full(frame):
+                    self._open_segment(frame)
+                self.writer.write(frame)
+                self.sidecar.write(json.dumps({"frame": self.segment_frames, "timestamp": timestamp,
+                                               "telemetry": telemetry}, default=str) + "\n")
+                self.segment_frames += 1
+                self.frames_written += 1
+                FRAMES_RECORDED.inc(drone=self.name)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Erro ao gravar frame de {self.name}: {str(e)}")
+        self._close_segment()
+
+    def _segment_full(self, frame):
+        """Indica se o segmento atual atingiu a duração ou o tamanho máximo (ou mudou a resolução)."""
+        if (frame.shape[1], frame.shape[0]) != self.segment_size:
+            return True
+        if self.segment_frames >= self.segment_seconds * self.fps:
+            return True
+        # O tamanho só é verificado a cada segundo de vídeo (o writer grava com buffer)
+        return (self.segment_frames % self.fps == 0
+                and os.path.getsize(self.segment_path) >= self.segment_bytes)
+
+    def _open_segment(self, frame):
+        """Fecha o segmento atual e abre o próximo."""
+        self._close_segment()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.directory, f"{self.name}-{stamp}-{len(self.segments) + 1:03d}")
+        self.segment_size = (frame.shape[1], frame.shape[0])
+        self.segment_path = base + SEGMENT_EXTENSION
+        self.writer = cv2.VideoWriter(self.segment_path, cv2.VideoWriter_fourcc(*SEGMENT_FOURCC),
+                                      self.fps, self.segment_size)
+        if not self.writer.isOpened():
+            self.writer = None
+            raise RuntimeError(f"Não foi possível abrir {self.segment_path}")
+        self.sidecar = open(base + SIDECAR_EXTENSION, "w", encoding="utf-8")
+        self.segment_frames = 0
+        self.segments.append(self.segment_path)
+        logger.info(f"Novo segmento de gravação: {self.segment_path}")
+
+    def _close_segment(self):
+        """Fecha o writer e a trilha de telemetria do segmento atual."""
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.sidecar is not None:
+            self.sidecar.close()
+            self.sidecar = None
+
+    def get_stats(self):
+        """Retorna o estado da gravação, os segmentos e os frames gravados e descartados."""
+        return {
+            "recording": self.is_recording,
+            "started_at": self.started_at,
+            "segments": list(self.segments),
+            "frames_written": self.frames_written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": self.queue.qsize(),
+        }
@@ -0,0 +1,436 @@
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from overlay import TextSprite
+
+logger = logging.getLogger("video-sources")
+
+# Taxa da fonte simulada e taxa assumida quando a fonte não informa a sua
+SIMULATION_FPS = 30
+DEFAULT_FPS = 30
+# Frames decodificados à frente da captura
+PREFETCH_FRAMES = 8
+# Espera máxima por um frame da fila de prefetch, em segundos
+READ_TIMEOUT = 0.5
+# Espera máxima pelo fim da thread de decodificação ao fechar a fonte, em segundos
+CLOSE_TIMEOUT = 2.0
+# Espera máxima entre tentativas de reconexão de um stream, em segundos (começa em READ_TIMEOUT e dobra)
+RECONNECT_MAX_DELAY = 10.0
+# Prefixos de BACKEND_VIDEO_SOURCE para as fontes plugáveis
+FILE_PREFIX = "file:"
+FRAMES_PREFIX = "frames:"
+FRAME_PATTERNS = ("*.jpg", "*.jpeg")
+
+# Aparência da fonte simulada
+GRID_SIZE = 50
+GRID_COLOR = (30, 30, 30)
+HORIZON_COLOR = (0, 120, 255)
+SKY_COLOR = (100, 150, 200)
+SKY_ALPHA = 0.3
+TITLE = "SIMULAÇÃO"
+TITLE_COLOR = (0, 165, 255)
+TIMESTAMP_COLOR = (255, 255, 255)
+
+
+def _fit_into(frame, buffer):
+    """Copia o frame para o buffer, redimensionando se a resolução mudou."""
+    if frame.shape != buffer.shape:
+        cv2.resize(frame, (buffer.shape[1], buffer.shape[0]), dst=buffer)
+    elif frame is not buffer:
+        np.copyto(buffer, frame)
+
+
+class VideoSource:
+    """Interface das fontes de vídeo do VideoProcessor.
+
+    open() prepara a fonte e define width e height; read_into(buffer) escreve o
+    próximo frame no buffer do anel de captura e retorna False se não havia frame.
+    frame_interval é o intervalo entre frames que a captura deve respeitar
+    (0 quando a própria leitura já bloqueia no ritmo da fonte).
+    """
+
+    video_source = "unknown"
+    # Falhas de leitura viram frames simulados (só para a câmera, como antes)
+    simulate_on_failure = False
+    frame_interval = 0
+    width = 640
+    height = 480
+
+    def open(self):
+        """Abre a fonte; retorna False se ela não estiver disponível."""
+        return True
+
+    def read_into(self, buffer):
+        """Escreve o próximo frame no buffer."""
+        raise NotImplementedError
+
+    def close(self):
+        """Libera os recursos da fonte."""
+
+    def get_stats(self):
+        """Retorna contadores próprios da fonte."""
+        return {}
+
+
+class CameraSource(VideoSource):
+    """Câmera local lida com cv2.VideoCapture na taxa nativa do sensor."""
+
+    video_source = "camera"
+    simulate_on_failure = True
+
+    def __init__(self, index=0):
+        """Define o índice da câmera (aberta só em open())."""
+        self.index = index
+        self.cap = None
+
+    def open(self):
+        """Abre a câmera (pode demorar segundos em máquinas sem câmera)."""
+        cap = cv2.VideoCapture(self.index)
+        if not cap.isOpened():
+            return False
+        self.cap = cap
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        logger.info(f"Câmera conectada: {self.width}x{self.height}")
+        return True
+
+    def read_into(self, buffer):
+        """Lê o frame da câmera diretamente no buffer do anel."""
+        if not self.cap.isOpened():
+            return False
+        ret, frame = self.cap.read(buffer)
+        if ret:
+            _fit_into(frame, buffer)
+        return ret
+
+    def close(self):
+        """Libera a câmera."""
+        if self.cap is not None:
+            self.cap.release()
+
+
+class DecodedSource(VideoSource):
+    """Base das fontes decodificadas em uma thread própria, com fila de prefetch limitada.
+
+    speed escala a taxa nativa da fonte (0 = o mais rápido que a decodificação permitir).
+    Fontes ao vivo descartam o frame mais antigo quando a fila enche, para não acumular
+    atraso; as gravadas esperam a captura consumir, sem perder frames.
+    """
+
+    live = False
+
+    def __init__(self, speed=1.0, loop=True, prefetch=PREFETCH_FRAMES):
+        """Configura velocidade, repetição e tamanho da fila de prefetch."""
+        self.speed = speed
+        self.loop = loop
+        self.fps = DEFAULT_FPS
+        self.queue = queue.Queue(maxsize=prefetch)
+        self.closed = False
+        # Acorda esperas da thread de decodificação (reconexão) quando a fonte é fechada
+        self.closing = threading.Event()
+        self.finished = False
+        self.thread = None
+        self.decoded = 0
+        self.dropped = 0
+        self.underruns = 0
+
+    @property
+    def frame_interval(self):
+        return 1 / (self.fps * self.speed) if self.speed > 0 else 0
+
+    def set_speed(self, speed):
+        """Altera a velocidade de reprodução (0 = o mais rápido possível)."""
+        self.speed = max(0.0, float(speed))
+
+    def open(self):
+        """Decodifica o primeiro frame (para conhecer a resolução) e inicia a thread de decodificação."""
+        if not self._open():
+            return False
+        frame = self._decode_next()
+        if frame is None:
+            logger.error(f"Fonte {self.video_source} não contém frames")
+            return False
+        self.height, self.width = frame.shape[:2]
+        self.queue.put(frame)
+        self.decoded += 1
+        self.thread = threading.Thread(target=self._decode_loop, name=f"decode-{self.video_source}", daemon=True)
+        self.thread.start()
+        return True
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _decode_next(self):
+        """Decodifica o próximo frame; None no fim da fonte."""
+        raise NotImplementedError
+
+    def _rewind(self):
+        """Volta ao início da fonte (ou reconecta); retorna False se não for possível."""
+        return False
+
+    def _release(self):
+        """Libera os recursos da fonte (chamado só quando nenhuma decodificação está em andamento)."""
+
+    def _decode_loop(self):
+        try:
+            self._decode_frames()
+        finally:
+            if self.closed:
+                # Fechada durante uma leitura longa: close() não esperou, a thread libera a fonte
+                self._release()
+
+    def _decode_frames(self):
+        while not self.closed:
+            frame = self._decode_next()
+            if frame is None:
+                # Fontes ao vivo sempre tentam reconectar; as gravadas só voltam ao início com loop
+                if (self.loop or self.live) and self._rewind():
+                    continue
+                self.finished = True
+                logger.info(f"Fonte {self.video_source} chegou ao fim")
+                return
+            self.decoded += 1
+
+            if self.live:
+                # Ao vivo: manter só os frames mais recentes
+                while True:
+                    try:
+                        self.queue.put_nowait(frame)
+                        break
+                    except queue.Full:
+                        try:
+                            self.queue.get_nowait()
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+            else:
+                # Gravada: esperar espaço na fila (a captura dita o ritmo)
+                while not self.closed:
+                    try:
+                        self.queue.put(frame, timeout=READ_TIMEOUT)
+                        break
+                    except queue.Full:
+                        pass
+
+    def read_into(self, buffer):
+        """Copia o próximo frame da fila de prefetch para o buffer do anel."""
+        try:
+            frame = self.queue.get(timeout=READ_TIMEOUT)
+        except queue.Empty:
+            if not self.finished:
+                self.underruns += 1
+            return False
+        _fit_into(frame, buffer)
+        return True
+
+    def close(self):
+        """Encerra a thread de decodificação e, depois que ela para, libera a fonte."""
+        self.closed = True
+        self.closing.set()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(CLOSE_TIMEOUT)
+            if thread.is_alive():
+                logger.warning(f"Decodificação de {self.video_source} ainda em andamento; a fonte será liberada ao final")
+                return
+        self._release()
+
+    def get_stats(self):
+        """Retorna os contadores de decodificação e a ocupação da fila."""
+        return {
+            "speed": self.speed,
+            "fps": self.fps,
+            "decoded": self.decoded,
+            "prefetched": self.queue.qsize(),
+            "dropped": self.dropped,
+            "underruns": self.underruns,
+            "finished": self.finished,
+        }
+
+
+class VideoFileSource(DecodedSource):
+    """Arquivo de vídeo decodificado com cv2.VideoCapture, na taxa do arquivo."""
+
+    video_source = "file"
+
+    def __init__(self, path, speed=1.0, loop=True, prefetch=PREFETCH_FRAMES):
+        """Define o arquivo a reproduzir."""
+        super().__init__(speed, loop, prefetch)
+        self.path = path
+        self.cap = None
+
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            logger.error(f"Não foi possível abrir {self.path}")
+            return False
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else DEFAULT_FPS
+        return True
+
+    def _decode_next(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def _rewind(self):
+        return self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _release(self):
+        cap, self.cap = self.cap, None
+        if cap is not None:
+            cap.release()
+
+
+class StreamSource(VideoFileSource):
+    """Stream de rede (RTSP, HTTP, UDP...) lido ao vivo; quando cai, reconecta até a fonte ser fechada."""
+
+    video_source = "stream"
+    live = True
+
+    def __init__(self, path, speed=1.0, loop=True, prefetch=PREFETCH_FRAMES):
+        """Define o endereço do stream."""
+        super().__init__(path, speed, loop, prefetch)
+        self.reconnects = 0
+
+    def _rewind(self):
+        """Reconecta com espera crescente (até RECONNECT_MAX_DELAY); retorna False só se a fonte foi fechada."""
+        logger.warning(f"Stream {self.path} interrompido, reconectando")
+        delay = READ_TIMEOUT
+        while not self.closed:
+            self._release()
+            if self.closing.wait(delay):
+                return False
+            self.reconnects += 1
+            if self._open():
+                logger.info(f"Stream {self.path} reconectado")
+                return True
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        return False
+
+    def get_stats(self):
+        """Retorna os contadores de decodificação e as reconexões."""
+        return {**super().get_stats(), "reconnects": self.reconnects}
+
+
+class FrameDirectorySource(DecodedSource):
+    """Diretório de frames JPEG (como a saída de demo_frames_generator), em ordem de nome."""
+
+    video_source = "frames"
+
+    def __init__(self, directory, fps=DEFAULT_FPS, speed=1.0, loop=True, prefetch=PREFETCH_FRAMES):
+        """Define o diretório e a taxa dos frames."""
+        super().__init__(speed, loop, prefetch)
+        self.directory = directory
+        self.fps = fps
+        self.files = []
+        self.position = 0
+
+    def _open(self):
+        self.files = sorted(path for pattern in FRAME_PATTERNS
+                            for path in glob.glob(os.path.join(self.directory, pattern)))
+        if not self.files:
+            logger.error(f"Nenhum frame JPEG em {self.directory}")
+        return bool(self.files)
+
+    def _decode_next(self):
+        while self.position < len(self.files):
+            path = self.files[self.position]
+            self.position += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                return frame
+            logger.warning(f"Frame ilegível ignorado: {path}")
+        return None
+
+    def _rewind(self):
+        self.position = 0
+        return True
+
+
+def create_source(spec, speed=1.0, loop=True):
+    """Cria a fonte plugável descrita por BACKEND_VIDEO_SOURCE, ou None para câmera/simulação.
+
+    Formatos: "file:<caminho>", "frames:<diretório>" e URLs ("rtsp://...", "http://...").
+    """
+    if spec.startswith(FILE_PREFIX):
+        return VideoFileSource(spec[len(FILE_PREFIX):], speed=speed, loop=loop)
+    if spec.startswith(FRAMES_PREFIX):
+        return FrameDirectorySource(spec[len(FRAMES_PREFIX):], speed=speed, loop=loop)
+    if "://" in spec:
+        return StreamSource(spec, speed=speed, loop=loop)
+    return None
+
+
+class SimulatedSource(VideoSource):
+    """Fonte de vídeo simulada sem alocação por frame.
+
+    O fundo (grade, horizonte e céu) é renderizado uma única vez, com uma margem
+    preta de um período da grade; o movimento é um recorte deslocado desse fundo
+    copiado para o buffer de saída. O título é um sprite pré-calculado (TextSprite)
+    misturado só na sua caixa, em buffers pré-alocados, e apenas o texto da data e
+    hora é desenhado a cada frame.
+    """
+
+    video_source = "simulation"
+    frame_interval = 1 / SIMULATION_FPS
+
+    def __init__(self, width, height, grid_size=GRID_SIZE):
+        """Pré-renderiza o fundo e o título para a resolução indicada."""
+        self.width = width
+        self.height = height
+        self.grid_size = grid_size
+        self.background = self._render_background()
+        self.title = TextSprite(TITLE, 1, TITLE_COLOR, 2)
+        self.title_org = (width // 2 - 80, 30)
+
+    def _render_background(self):
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+
+        # Grade para simular perspectiva
+        for i in range(0, self.width, self.grid_size):
+            cv2.line(frame, (i, 0), (i, self.height), GRID_COLOR, 1)
+        for i in range(0, self.height, self.grid_size):
+            cv2.line(frame, (0, i), (self.width, i), GRID_COLOR, 1)
+
+        # Horizonte
+        horizon_y = self.height // 2
+        cv2.line(frame, (0, horizon_y), (self.width, horizon_y), HORIZON_COLOR, 2)
+
+        # "Céu" misturado com a cor de fundo
+        sky = frame[:horizon_y]
+        cv2.addWeighted(sky, 1 - SKY_ALPHA, np.full_like(sky, SKY_COLOR), SKY_ALPHA, 0, dst=sky)
+
+        # Margem preta à esquerda e acima: o deslocamento revela essas faixas, como no warpAffine
+        canvas = np.zeros((self.height + self.grid_size, self.width + self.grid_size, 3), dtype=np.uint8)
+        canvas[self.grid_size:, self.grid_size:] = frame
+        return canvas
+
+    def render_into(self, out, now=None):
+        """Escreve o frame do instante indicado (padrão: agora) no buffer de saída."""
+        now = time.time() if now is None else now
+        grid = self.grid_size
+
+        # Movimento simulado: recorte do fundo deslocado (equivalente à translação da grade)
+        offset_x = int((now * 10) % grid)
+        offset_y = int((now * 5) % grid)
+        np.copyto(out, self.background[grid - offset_y:grid - offset_y + self.height,
+                                       grid - offset_x:grid - offset_x + self.width])
+
+        # Título pré-renderizado e data e hora
+        if not self.title.draw(out, self.title_org):
+            # Resolução pequena demais para o sprite inteiro
+            cv2.putText(out, TITLE, self.title_org, cv2.FONT_HERSHEY_SIMPLEX, 1, TITLE_COLOR, 2)
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        cv2.putText(out, timestamp, (10, self.height - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, TIMESTAMP_COLOR, 1)
+        return out
+
+    def read_into(self, buffer):
+        """Escreve o frame de agora no buffer do anel."""
+        self.render_into(buffer)
+        return True
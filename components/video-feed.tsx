@@ -6,7 +6,9 @@ import { motion, AnimatePresence } from "framer-motion"
 import { Video, VideoOff, Wifi, WifiOff } from "lucide-react"
 
 export default function VideoFeed() {
-  const { currentFrame, connected, useFallbackMode, droneState } = useWebSocket()
+  const { currentFrame, currentFrameUrl, connected, useFallbackMode, droneState } = useWebSocket()
+  // Frames binários chegam só como URL de blob; frames JSON também trazem o base64
+  const frameSrc = currentFrameUrl ?? (currentFrame ? `data:image/jpeg;base64,${currentFrame}` : null)
   const [imageError, setImageError] = useState(false)
   const [showOverlay, setShowOverlay] = useState(true)
 
@@ -33,9 +35,9 @@ export default function VideoFeed() {
   return (
     <div className="relative w-full h-full bg-black rounded-lg overflow-hidden" onMouseMove={handleMouseMove}>
       {connected || useFallbackMode ? (
-        currentFrame ? (
+        frameSrc ? (
           <motion.img
-            src={`data:image/jpeg;base64,${currentFrame}`}
+            src={frameSrc}
             alt="Video feed"
             className="w-full h-full object-contain"
             onError={() => setImageError(true)}
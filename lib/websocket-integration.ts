@@ -113,6 +113,104 @@ export function mapCommandToBackend(command: any) {
   }
 }
 
+/**
+ * Header of a binary frame sent by the backend (see backend/frame_protocol.py)
+ */
+export interface BinaryFrameHeader {
+  version: number
+  codec: number
+  sequence: number
+  timestamp: number
+  width: number
+  height: number
+  droneIndex: number
+}
+
+// Fixed header size: version (u8), codec (u8), sequence (u32), timestamp ms (u64), width (u16), height (u16),
+// drone index (u16). Version 1 headers have no drone index and are 18 bytes long.
+export const BINARY_FRAME_HEADER_SIZE = 20
+const BINARY_FRAME_HEADER_V1_SIZE = 18
+
+/**
+ * Parse a binary frame message into its header and encoded image payload
+ * @param buffer The binary WebSocket message
+ * @returns The header fields and the payload bytes
+ */
+export function parseBinaryFrame(buffer: ArrayBuffer) {
+  const view = new DataView(buffer)
+  const version = view.getUint8(0)
+  const header: BinaryFrameHeader = {
+    version,
+    codec: view.getUint8(1),
+    sequence: view.getUint32(2),
+    timestamp: view.getUint32(6) * 2 ** 32 + view.getUint32(10),
+    width: view.getUint16(14),
+    height: view.getUint16(16),
+    droneIndex: version === 1 ? 0 : view.getUint16(18),
+  }
+  const headerSize = version === 1 ? BINARY_FRAME_HEADER_V1_SIZE : BINARY_FRAME_HEADER_SIZE
+  return { header, payload: new Uint8Array(buffer, headerSize) }
+}
+
+// Telemetry snapshots received from the backend, indexed by sequence number
+const telemetrySnapshots = new Map<number, Record<string, any>>()
+const TELEMETRY_HISTORY_SIZE = 64
+
+/**
+ * Forget all telemetry snapshots (call on every new connection)
+ */
+export function resetTelemetrySnapshots() {
+  telemetrySnapshots.clear()
+}
+
+/**
+ * Apply a delta-encoded telemetry message (see backend/telemetry_stream.py)
+ * @param message The "telemetry" message from the backend
+ * @returns The full flattened snapshot, or null if the base snapshot is unknown and a keyframe is needed
+ */
+export function applyTelemetryMessage(message: any): Record<string, any> | null {
+  let base: Record<string, any> = {}
+  if (!message.keyframe) {
+    const known = telemetrySnapshots.get(message.base)
+    if (!known) {
+      return null
+    }
+    base = known
+  }
+
+  const snapshot = { ...base, ...message.fields }
+  telemetrySnapshots.set(message.seq, snapshot)
+
+  // Keep only the most recent snapshots
+  telemetrySnapshots.forEach((_, seq) => {
+    if (seq <= message.seq - TELEMETRY_HISTORY_SIZE) {
+      telemetrySnapshots.delete(seq)
+    }
+  })
+
+  return snapshot
+}
+
+/**
+ * Map a flattened telemetry snapshot to the frontend drone state
+ * @param fields The flattened snapshot ("state.atitude.yaw" style keys)
+ * @returns The drone state fields for the frontend
+ */
+export function mapTelemetryFields(fields: Record<string, any>) {
+  return {
+    battery: fields["state.bateria"],
+    altitude: fields["state.altura"],
+    temperature: fields["state.temperatura"],
+    attitude: {
+      pitch: fields["state.atitude.pitch"],
+      roll: fields["state.atitude.roll"],
+      yaw: fields["state.atitude.yaw"],
+    },
+    isFlying: fields["state.altura"] > 0.1, // Assume flying if altitude > 10cm
+    isRecording: fields["state.is_recording"],
+  }
+}
+
 /**
  * Map backend state to frontend state
  * @param backendState The state from the backend
@@ -1,7 +1,13 @@
 "use client"
 
 import { create } from "zustand"
-import { mapCommandToBackend } from "./websocket-integration"
+import {
+  applyTelemetryMessage,
+  mapCommandToBackend,
+  mapTelemetryFields,
+  parseBinaryFrame,
+  resetTelemetrySnapshots,
+} from "./websocket-integration"
 
 // Define the store for WebSocket state
 interface WebSocketState {
@@ -12,6 +18,10 @@ interface WebSocketState {
   connectionError: string | null
   useFallbackMode: boolean
   currentFrame: string | null
+  currentFrameUrl: string | null
+  frameSequence: number
+  useBinaryFrames: boolean
+  telemetryRateHz: number
   droneState: any
   mode: string
   simulationData: {
@@ -37,6 +47,10 @@ export const useWebSocketStore = create<WebSocketState>((set, get) => ({
   connectionError: null,
   useFallbackMode: false,
   currentFrame: null,
+  currentFrameUrl: null,
+  frameSequence: 0,
+  useBinaryFrames: true,
+  telemetryRateHz: 10,
   droneState: {
     battery: 100,
     altitude: 0,
@@ -86,6 +100,8 @@ export const useWebSocketStore = create<WebSocketState>((set, get) => ({
 
       try {
         ws = new WebSocket(wsUrl)
+        // Frames binários chegam como ArrayBuffer (cabeçalho fixo + JPEG)
+        ws.binaryType = "arraybuffer"
       } catch (error) {
         console.error("Error creating WebSocket:", error)
         throw new Error(`Erro ao criar WebSocket: ${error instanceof Error ? error.message : String(error)}`)
@@ -98,7 +114,17 @@ export const useWebSocketStore = create<WebSocketState>((set, get) => ({
 
         try {
           // Send initial connect command
-          ws.send(JSON.stringify({ type: "connect", useTello: false }))
+          resetTelemetrySnapshots()
+          ws.send(
+            JSON.stringify({
+              type: "connect",
+              useTello: false,
+              codec: "json",
+              binary: get().useBinaryFrames,
+              telemetry_hz: get().telemetryRateHz,
+              telemetry_ack: true,
+            }),
+          )
         } catch (error) {
           console.error("Error sending initial connect command:", error)
         }
@@ -181,12 +207,40 @@ export const useWebSocketStore = create<WebSocketState>((set, get) => ({
 
       ws.onmessage = (event) => {
         try {
+          // Frame binário: cabeçalho fixo seguido do JPEG, sem base64
+          if (event.data instanceof ArrayBuffer) {
+            const { header, payload } = parseBinaryFrame(event.data)
+            const previousUrl = get().currentFrameUrl
+            const frameUrl = URL.createObjectURL(new Blob([payload], { type: "image/jpeg" }))
+            set({ currentFrame: null, currentFrameUrl: frameUrl, frameSequence: header.sequence })
+            if (previousUrl && previousUrl.startsWith("blob:")) {
+              URL.revokeObjectURL(previousUrl)
+            }
+            return
+          }
+
           const data = JSON.parse(event.data)
-          console.log("WebSocket message received:", data.type)
+
+          if (data.type === "telemetry") {
+            // Telemetria delta: aplicar sobre o snapshot base e confirmar o recebimento
+            const snapshot = applyTelemetryMessage(data)
+            if (!snapshot) {
+              ws.send(JSON.stringify({ type: "telemetry_keyframe" }))
+              return
+            }
+            set({
+              droneState: {
+                ...get().droneState,
+                ...mapTelemetryFields(snapshot),
+              },
+              mode: snapshot.mode,
+            })
+            ws.send(JSON.stringify({ type: "telemetry_ack", seq: data.seq }))
+            return
+          }
 
           if (data.type === "frame") {
             set({
-              currentFrame: data.frame,
               droneState: {
                 ...get().droneState,
                 battery: data.state.bateria,
@@ -200,6 +254,8 @@ export const useWebSocketStore = create<WebSocketState>((set, get) => ({
                 isFlying: data.state.altura > 0.1, // Assume flying if altitude > 10cm
               },
               mode: data.mode,
+              currentFrame: data.frame,
+              currentFrameUrl: `data:image/jpeg;base64,${data.frame}`,
             })
           }
 